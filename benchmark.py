@@ -0,0 +1,376 @@
+"""
+Throughput benchmarks for the board engines and the search.
+
+    python benchmark.py --engine bitboard --output bench.json
+    python benchmark.py --engine bitboard --compare bench.json
+
+Three groups of results are written as one JSON document:
+    perft   - leaf counts of the full move tree from reference positions to fixed depths, checked
+              against known counts, with nodes per second
+    micro   - time per call of copy, move generation, mobility counts, forecast_move, push/pop, the
+              evaluation function and the MCTS playout kernel (mcts.random_playout)
+    search  - nodes per second of submission.alphabeta at a fixed depth
+With --scaling, a fourth group measures how the engine copes with board size:
+    scaling - per board size from SCALING_SIZES (9x9 up to 31x31, a quarter of the spaces blocked),
+              calls per second of the board primitives and the alphabeta nodes per second of a
+              time-limited deepening search
+With --compare, every rate is checked against an earlier run and the exit status is 1 if any got
+slower than the tolerance allows or a perft count changed.
+"""
+from argparse import ArgumentParser
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+from isolation import Board
+from mcts import random_playout
+from submission import CustomPlayer, OpenMoveEvalFn, SearchStats, alphabeta
+
+
+# Reference positions. Rows map to the first index of the board state; '.' is blank, 'X' blocked,
+# '1' and '2' the queens. Each entry has the side to move, perft depths and their known leaf counts.
+POSITIONS = {
+    "start": {
+        "rows": [".........",
+                 ".........",
+                 ".........",
+                 ".........",
+                 ".........",
+                 ".........",
+                 ".........",
+                 ".........",
+                 "........."],
+        "p1_turn": True,
+        "perft": {1: 81, 2: 6480, 3: 162480},
+    },
+    "midgame": {
+        "rows": [".........",
+                 "..XX.....",
+                 "..X1X....",
+                 "...XX....",
+                 ".....XX..",
+                 "....X2X..",
+                 ".....X...",
+                 ".........",
+                 "........."],
+        "p1_turn": True,
+        "perft": {1: 5, 2: 35, 3: 262, 4: 1772, 5: 12506, 6: 93896},
+    },
+    "endgame": {
+        "rows": ["XXXX.XXXX",
+                 "X...XX..X",
+                 "X.X1X.X.X",
+                 "XX.XXX.XX",
+                 "X..X.XX.X",
+                 "X.XX2X..X",
+                 "XX...X.XX",
+                 "X..XX...X",
+                 "XXXXXXXXX"],
+        "p1_turn": False,
+        "perft": {1: 4, 2: 16, 3: 28, 4: 70, 5: 148, 6: 189, 7: 338, 8: 436},
+    },
+}
+
+# Positions and depth of the alphabeta nodes per second benchmark
+SEARCH_POSITIONS = ("midgame", "endgame")
+SEARCH_DEPTH = 5
+
+
+# Board sizes, share of blocked spaces and search seconds of the scaling benchmark
+SCALING_SIZES = (9, 15, 21, 31)
+SCALING_BLOCKED = 0.25
+SCALING_SECONDS = 2.0
+
+
+class BenchmarkPlayer(CustomPlayer):
+    """Plain CustomPlayer, only here so the two queens get distinct names."""
+
+
+def load_position(name, engine="bitboard"):
+    """
+    Set up one of the reference positions on a new board.
+    Parameters:
+        name: str, Key of POSITIONS
+        engine: str, Board engine
+    Returns:
+        (Board, CustomPlayer, CustomPlayer): The board and its two players
+    """
+    position = POSITIONS[name]
+    symbols = {".": Board.BLANK, "X": Board.BLOCKED, "1": "Q1", "2": "Q2"}
+    state = [[symbols[space] for space in line] for line in position["rows"]]
+    player_1, player_2 = CustomPlayer(), BenchmarkPlayer()
+    board = Board(player_1, player_2, len(state[0]), len(state), engine=engine)
+    board.set_state(state, p1_turn=position["p1_turn"])
+    return board, player_1, player_2
+
+
+def perft(board, depth):
+    """
+    Count the positions reached after exactly depth moves, walking the tree with push_move/pop_move.
+    Games that end earlier do not count.
+    Parameters:
+        board: Board, Position to count from; left unchanged
+        depth: int, Number of moves
+    Returns:
+        int: Number of leaf positions
+    """
+    moves = board.get_active_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.push_move(move)
+        nodes += perft(board, depth - 1)
+        board.pop_move()
+    return nodes
+
+
+def run_perft(engine):
+    """
+    Run perft on every reference position and depth.
+    Returns:
+        dict: "position/depth" -> nodes, expected nodes, ok flag, seconds, nodes per second
+    """
+    results = {}
+    for name, position in POSITIONS.items():
+        for depth, expected in sorted(position["perft"].items()):
+            board, player_1, player_2 = load_position(name, engine)
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            seconds = time.perf_counter() - start
+            results["%s/%d" % (name, depth)] = {"nodes": nodes,
+                                                 "expected": expected,
+                                                 "ok": nodes == expected,
+                                                 "seconds": seconds,
+                                                 "nps": nodes / seconds if seconds else None}
+    return results
+
+
+def _time_call(function, min_seconds=0.2):
+    """
+    Calls per second of function, timed over at least min_seconds.
+    """
+    timer = timeit.Timer(function)
+    number, seconds = timer.autorange()
+    while seconds < min_seconds:
+        number *= 2
+        seconds = timer.timeit(number)
+    return number / seconds
+
+
+def run_micro(engine):
+    """
+    Time the board primitives, the evaluation function and the playout kernel on the midgame position.
+    Returns:
+        dict: name -> calls per second
+    """
+    board, player_1, player_2 = load_position("midgame", engine)
+    move = board.get_active_moves()[0]
+    eval_fn = OpenMoveEvalFn()
+
+    def push_pop():
+        board.push_move(move)
+        board.pop_move()
+
+    occupancy = board.get_occupancy_mask()
+    mover, other = [position[0] * board.width + position[1]
+                    for position in (board.get_active_position(), board.get_inactive_position())]
+    rng = random.Random(0)
+
+    return {"copy": _time_call(board.copy),
+            "get_active_moves": _time_call(board.get_active_moves),
+            "get_active_mobility": _time_call(board.get_active_mobility),
+            "forecast_move": _time_call(lambda: board.forecast_move(move)),
+            "push_pop_move": _time_call(push_pop),
+            "eval_open_move": _time_call(lambda: eval_fn.score(board, player_1)),
+            "random_playout": _time_call(lambda: random_playout(occupancy, mover, other, board.width, board.height,
+                                                                rng))}
+
+
+def run_search(engine, depth=SEARCH_DEPTH):
+    """
+    Nodes per second of alphabeta to a fixed depth. The nodes, leaves included, are counted by the
+    player's SearchStats, whose bookkeeping is part of the time.
+    Returns:
+        dict: position -> nodes, leaf evaluations, seconds, nodes per second, best move, value
+    """
+    results = {}
+    for name in SEARCH_POSITIONS:
+        board, player_1, player_2 = load_position(name, engine)
+        player = board.get_active_player()
+        player.search_stats = stats = SearchStats()
+        stats.reset(board)
+
+        start = time.perf_counter()
+        best_move, val = alphabeta(player, board, lambda: float("inf"), depth)
+        seconds = time.perf_counter() - start
+        nodes = sum(stats.nodes)
+        results[name] = {"depth": depth,
+                         "nodes": nodes,
+                         "leaves": stats.leaves,
+                         "seconds": seconds,
+                         "nps": nodes / seconds if seconds else None,
+                         "best_move": best_move,
+                         "value": val}
+    return results
+
+
+def scaling_position(size, engine="bitboard"):
+    """
+    A reproducible square mid-game position: SCALING_BLOCKED of the spaces blocked at random (seeded by
+    the size), queen 1 in the centre and queen 2 a third of the way in, queen 1 to move.
+    Returns:
+        (Board, CustomPlayer, CustomPlayer): The board and its two players
+    """
+    rng = random.Random("scaling %d" % size)
+    state = [[Board.BLOCKED if rng.random() < SCALING_BLOCKED else Board.BLANK for row in range(size)]
+             for col in range(size)]
+    state[size // 2][size // 2] = "Q1"
+    state[size // 3][size // 3] = "Q2"
+    player_1, player_2 = CustomPlayer(), BenchmarkPlayer()
+    board = Board(player_1, player_2, size, size, engine=engine)
+    board.set_state(state, p1_turn=True)
+    return board, player_1, player_2
+
+
+def run_scaling(engine, sizes=SCALING_SIZES, seconds=SCALING_SECONDS):
+    """
+    Time the board primitives and a deepening alphabeta search on scaling_position of every size.
+    Nodes are counted by SearchStats like in run_search.
+    Returns:
+        dict: size -> moves of the side to move, calls per second of each primitive, nodes, depth
+        reached and nodes per second of the search
+    """
+    results = {}
+    for size in sizes:
+        board, player_1, player_2 = scaling_position(size, engine)
+        moves = board.get_active_moves()
+        move = moves[-1]
+        eval_fn = OpenMoveEvalFn()
+
+        def push_pop():
+            board.push_move(move)
+            board.pop_move()
+
+        result = {"moves": len(moves),
+                  "get_active_moves": _time_call(board.get_active_moves),
+                  "copy": _time_call(board.copy),
+                  "push_pop_move": _time_call(push_pop),
+                  "eval_open_move": _time_call(lambda: eval_fn.score(board, player_1)),
+                  "is_partitioned": _time_call(board.is_partitioned)}
+
+        player_1.search_stats = stats = SearchStats()
+        stats.reset(board)
+        end = time.perf_counter() + seconds
+
+        def time_left():
+            # alphabeta stops 100 ms before it runs out
+            return 1000 * (end - time.perf_counter()) + 100
+
+        start = time.perf_counter()
+        depth = 0
+        while time.perf_counter() < end:
+            alphabeta(player_1, board, time_left, depth + 1)
+            if time.perf_counter() < end:
+                depth += 1
+        elapsed = time.perf_counter() - start
+        nodes = sum(stats.nodes)
+        result.update({"nodes": nodes,
+                       "depth": depth,
+                       "seconds": elapsed,
+                       "nps": nodes / elapsed if elapsed else None})
+        results[str(size)] = result
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(engine, scaling=False):
+    """
+    Run every benchmark.
+    Parameters:
+        engine: str, Board engine
+        scaling: bool, Also run the board size scaling benchmark
+    Returns:
+        dict: Machine readable report
+    """
+    report = {"revision": _git_revision(),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "engine": engine,
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "perft": run_perft(engine),
+              "micro": run_micro(engine),
+              "search": run_search(engine)}
+    if scaling:
+        report["scaling"] = run_scaling(engine)
+    return report
+
+
+def compare(report, baseline, tolerance=0.1):
+    """
+    Find throughput regressions against an earlier report.
+    Parameters:
+        report: dict, Current results from run_all
+        baseline: dict, Earlier results from run_all
+        tolerance: float, Allowed relative slowdown
+    Returns:
+        [str]: One line per regression, empty if there are none
+    """
+    problems = []
+    for name, result in report["perft"].items():
+        if not result["ok"]:
+            problems.append("perft %s: %d nodes, expected %d" % (name, result["nodes"], result["expected"]))
+    rates = [("perft " + name, result["nps"], baseline["perft"].get(name, {}).get("nps"))
+             for name, result in report["perft"].items()]
+    rates += [("micro " + name, rate, baseline["micro"].get(name)) for name, rate in report["micro"].items()]
+    rates += [("search " + name, result["nps"], baseline["search"].get(name, {}).get("nps"))
+              for name, result in report["search"].items()]
+    for size, result in report.get("scaling", {}).items():
+        old_result = baseline.get("scaling", {}).get(size, {})
+        rates += [("scaling %sx%s %s" % (size, size, name), result[name], old_result.get(name))
+                  for name in ("get_active_moves", "copy", "push_pop_move", "eval_open_move", "is_partitioned", "nps")]
+    for name, rate, old_rate in rates:
+        if rate and old_rate and rate < old_rate * (1.0 - tolerance):
+            problems.append("%s: %.0f/s, was %.0f/s (%.0f%% slower)" % (name, rate, old_rate, 100 * (1 - rate / old_rate)))
+    return problems
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmark isolation move generation and search throughput.")
+    parser.add_argument("--engine", choices=Board.ENGINES, default="bitboard")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", default=None, help="earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown")
+    parser.add_argument("--scaling", action="store_true", help="also measure throughput by board size")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.engine, scaling=args.scaling)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        return 1 if problems else 0
+    return 0 if all(result["ok"] for result in report["perft"].values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
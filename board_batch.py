@@ -0,0 +1,172 @@
+"""
+Many boards of one size packed (Board.to_bytes) side by side in a block of shared memory, so a process
+pool can be handed any number of positions without pickling a single board:
+
+    with BoardBatch.from_boards(boards) as batch:
+        futures = [pool.submit(score_range, batch, start, min(start + 256, len(batch)))
+                   for start in range(0, len(batch), 256)]
+
+    def score_range(batch, start, stop):          # in the worker
+        player_1, player_2 = CustomPlayer(), OtherPlayer()
+        return [score(batch.get(i, player_1, player_2)) for i in range(start, stop)]
+
+A batch pickles as the name of its shared memory block, so submitting it costs the same for ten boards
+as for a million; the worker attaches to the block and unpacks only the boards it reads. The process
+that created the batch owns the block and removes it on close() (or leaving the with block); workers
+only detach. Boards come back without their players, which the reader passes in, and without move
+history.
+
+Block layout (little endian): the magic b"ISOBATCH", board width and height (uint16 each), capacity
+and number of boards stored (uint32 each), then capacity slots of Board.packed_size(width, height)
+bytes.
+"""
+import struct
+from multiprocessing import shared_memory
+
+from isolation import Board
+
+
+MAGIC = b"ISOBATCH"
+HEADER = struct.Struct("<8sHHII")
+
+
+class BoardBatch:
+    """Fixed-capacity array of packed boards in shared memory."""
+
+    def __init__(self, capacity, width=9, height=9):
+        """
+        Create a new, empty batch owned by this process.
+        Args:
+            capacity (int): Number of boards the block has room for
+            width, height (int): Board size of every board in the batch
+        """
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.slot_size = Board.packed_size(width, height)
+        self.__owner__ = True
+        self.__memory__ = shared_memory.SharedMemory(create=True, size=HEADER.size + capacity * self.slot_size)
+        HEADER.pack_into(self.__memory__.buf, 0, MAGIC, width, height, capacity, 0)
+
+    @classmethod
+    def from_boards(cls, boards):
+        """
+        Create a batch holding boards, which must all have the same size.
+        Args:
+            boards (list): Boards to store, at least one
+        Returns:
+            BoardBatch
+        """
+        if not boards:
+            raise ValueError("a board batch needs at least one board to take its size from")
+        batch = cls(len(boards), boards[0].width, boards[0].height)
+        for board in boards:
+            batch.append(board)
+        return batch
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Open the batch in the shared memory block called name, created by another process.
+        Args:
+            name (str): Block name, see the name attribute
+        Returns:
+            BoardBatch
+        """
+        batch = object.__new__(cls)
+        batch.__attach__(name)
+        return batch
+
+    def __attach__(self, name):
+        self.__owner__ = False
+        self.__memory__ = shared_memory.SharedMemory(name=name)
+        magic, self.width, self.height, self.capacity, count = HEADER.unpack_from(self.__memory__.buf, 0)
+        if magic != MAGIC:
+            self.__memory__.close()
+            raise ValueError("shared memory block %s is not a board batch" % name)
+        self.slot_size = Board.packed_size(self.width, self.height)
+
+    @property
+    def name(self):
+        return self.__memory__.name
+
+    def __getstate__(self):
+        """Only the block name travels; unpickling attaches to the block."""
+        return {"name": self.name}
+
+    def __setstate__(self, state):
+        self.__attach__(state["name"])
+
+    def __len__(self):
+        return HEADER.unpack_from(self.__memory__.buf, 0)[4]
+
+    def __slot__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("board %d of a batch of %d" % (index, len(self)))
+        return HEADER.size + index * self.slot_size
+
+    def append(self, board):
+        """
+        Store board after the boards stored so far.
+        Args:
+            board (Board): Board of the batch's size
+        Returns:
+            int: Index of the board
+        """
+        count = len(self)
+        if count >= self.capacity:
+            raise IndexError("board batch is full (%d boards)" % self.capacity)
+        # fill the slot before the count publishes it, so an attached reader never sees it half written
+        self.__write__(HEADER.size + count * self.slot_size, board)
+        HEADER.pack_into(self.__memory__.buf, 0, MAGIC, self.width, self.height, self.capacity, count + 1)
+        return count
+
+    def __setitem__(self, index, board):
+        """Replace the board stored at index."""
+        self.__write__(self.__slot__(index), board)
+
+    def __write__(self, offset, board):
+        if (board.width, board.height) != (self.width, self.height):
+            raise ValueError("%dx%d board in a %dx%d batch" % (board.width, board.height, self.width, self.height))
+        self.__memory__.buf[offset:offset + self.slot_size] = board.to_bytes()
+
+    def get_bytes(self, index):
+        """
+        Args:
+            index (int): Board index
+        Returns:
+            memoryview: The packed board (Board.to_bytes layout), a view into the shared block
+        """
+        offset = self.__slot__(index)
+        return self.__memory__.buf[offset:offset + self.slot_size]
+
+    def get(self, index, player_1, player_2, engine="bitboard"):
+        """
+        Unpack one board.
+        Args:
+            index (int): Board index
+            player_1, player_2: Players of queen 1 and 2, see Board.from_bytes
+            engine (str): Board engine
+        Returns:
+            Board
+        """
+        data = self.get_bytes(index)
+        try:
+            return Board.from_bytes(data, player_1, player_2, engine)
+        finally:
+            data.release()
+
+    def close(self):
+        """Detach from the block; the process that created the batch also removes it."""
+        if self.__memory__ is None:
+            return
+        self.__memory__.close()
+        if self.__owner__:
+            self.__memory__.unlink()
+        self.__memory__ = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,252 @@
+"""
+Compact binary records of finished games, an append-only file format holding any number of them, and a
+streaming replay that walks a record's positions one at a time.
+
+    with GameRecordWriter("games.bin") as writer:
+        winner, move_history, termination = board.play_isolation()
+        writer.write(GameRecord.from_game(board, winner, move_history, termination))
+
+    for record in read_records("games.bin"):
+        for board in replay(record):
+            ...
+
+File layout (little endian): the magic b"ISOGAME1", then one record after another, each prefixed with
+its length in bytes (uint32). A record holds:
+    board width and height (uint16 each), winner (uint8: 1 or 2 for the queen, 0 if unknown),
+    termination reason (uint8, see TERMINATIONS), number of moves (uint16),
+    the class names of both players (uint8 length + UTF-8 each),
+    the moves of both players in the order they were played, each as the space index
+    (col * width + row) in one byte, or two on boards with 255 or more spaces;
+    the largest value stands for a move that is not on the board.
+A writer that dies halfway through a record leaves a short last record, which readers skip.
+"""
+import struct
+
+from isolation import Board
+
+
+MAGIC = b"ISOGAME1"
+LENGTH = struct.Struct("<I")
+HEADER = struct.Struct("<HHBBH")
+
+# Termination reasons by code, as the end of the text play_isolation returns after the loser's queen
+TERMINATIONS = (" has no legal moves left.", " timed out.", " made an illegal move.")
+TIMED_OUT = 1
+OTHER_TERMINATION = 255
+
+
+class GameRecord:
+    """One finished game: board size, players, moves, winner and how it ended."""
+
+    def __init__(self, width, height, player_1, player_2, moves, winner=0, termination=OTHER_TERMINATION):
+        """
+        Args:
+            width, height (int): Board size
+            player_1, player_2 (str): Class names of the players of queen 1 and 2
+            moves (list): (col, row) moves of both players in the order they were played, starting with
+                queen 1; the last one may be the timed out or illegal move that ended the game
+                (Board.NOT_MOVED if the player returned None)
+            winner (int): 1 or 2 for the winning queen, 0 if unknown
+            termination (int): Index into TERMINATIONS, OTHER_TERMINATION if it is none of them
+        """
+        self.width = width
+        self.height = height
+        self.player_1 = player_1
+        self.player_2 = player_2
+        self.moves = moves
+        self.winner = winner
+        self.termination = termination
+
+    @classmethod
+    def from_game(cls, board, winner, move_history, termination, opening=()):
+        """
+        Build a record from the result of Board.play_isolation. A None move (a player that returned
+        None) can only be the move that ended the game and is stored as Board.NOT_MOVED.
+        Args:
+            board (Board): The board the game was played on
+            winner (str): Queen of the winner
+            move_history (list): [[queen 1 move, queen 2 move], ...] as play_isolation returns it
+            termination (str): Reason for game over
+            opening (list): Moves applied to the board before play_isolation was called
+        Returns:
+            GameRecord
+        """
+        moves = [tuple(move) for move in opening]
+        # a game that queen 2 started has a [None, move] first pair
+        if move_history and len(move_history[0]) == 2 and move_history[0][0] is None:
+            move_history = [move_history[0][1:]] + move_history[1:]
+        moves += [Board.NOT_MOVED if move is None else tuple(move) for pair in move_history for move in pair]
+        if winner == board.__queen_1__:
+            winner_code = 1
+        elif winner == board.__queen_2__:
+            winner_code = 2
+        else:
+            winner_code = 0
+        code = OTHER_TERMINATION
+        for i, reason in enumerate(TERMINATIONS):
+            if termination.endswith(reason):
+                code = i
+        return cls(board.width, board.height, board.__player_1__.__class__.__name__,
+                   board.__player_2__.__class__.__name__, moves, winner_code, code)
+
+    def queens(self):
+        """
+        Queen names of the game, the same Board gives the players of this record.
+        Returns:
+            (str, str): Queen 1, queen 2
+        """
+        return self.player_1 + " - Q1", self.player_2 + " - Q2"
+
+    def termination_text(self):
+        """
+        Reason for game over in the words of play_isolation.
+        Returns:
+            str: e.g. "CustomPlayer - Q2 has no legal moves left.", "" if it was none of TERMINATIONS
+        """
+        if self.termination >= len(TERMINATIONS) or not self.winner:
+            return ""
+        loser = self.queens()[2 - self.winner]
+        return loser + TERMINATIONS[self.termination]
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return "GameRecord(%dx%d, %s vs %s, %d moves, winner %d)" % (
+            self.width, self.height, self.player_1, self.player_2, len(self.moves), self.winner)
+
+
+def _move_format(width, height):
+    """struct format of one move and the value that stands for a move off the board."""
+    if width * height < 255:
+        return "B", 255
+    return "H", 65535
+
+
+def encode_record(record):
+    """
+    Pack a record, without its length prefix.
+    Args:
+        record (GameRecord): The game
+    Returns:
+        bytes: The packed record
+    """
+    width, height = record.width, record.height
+    move_format, off_board = _move_format(width, height)
+    names = b""
+    for name in (record.player_1, record.player_2):
+        data = name.encode("utf-8")[:255]
+        names += bytes([len(data)]) + data
+    moves = [col * width + row if 0 <= col < height and 0 <= row < width else off_board
+             for col, row in record.moves]
+    return (HEADER.pack(width, height, record.winner, record.termination, len(moves)) + names +
+            struct.pack("<%d%s" % (len(moves), move_format), *moves))
+
+
+def decode_record(data):
+    """
+    Unpack a record packed by encode_record.
+    Args:
+        data (bytes): The packed record
+    Returns:
+        GameRecord
+    """
+    width, height, winner, termination, count = HEADER.unpack_from(data, 0)
+    offset = HEADER.size
+    names = []
+    for i in range(2):
+        length = data[offset]
+        names.append(bytes(data[offset + 1:offset + 1 + length]).decode("utf-8"))
+        offset += 1 + length
+    move_format, off_board = _move_format(width, height)
+    moves = [(index // width, index % width) if index != off_board else Board.NOT_MOVED
+             for index in struct.unpack_from("<%d%s" % (count, move_format), data, offset)]
+    return GameRecord(width, height, names[0], names[1], moves, winner, termination)
+
+
+class GameRecordWriter:
+    """Appends records to a game file, creating it if needed."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Game file
+        """
+        self.path = path
+        self.__file__ = open(path, "ab")
+        if self.__file__.tell() == 0:
+            self.__file__.write(MAGIC)
+        self.games = 0
+
+    def write(self, record):
+        """Append one GameRecord."""
+        self.write_encoded(encode_record(record))
+
+    def write_encoded(self, data):
+        """Append one record packed by encode_record (e.g. in a worker process)."""
+        self.__file__.write(LENGTH.pack(len(data)) + data)
+        self.games += 1
+
+    def flush(self):
+        self.__file__.flush()
+
+    def close(self):
+        self.__file__.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(path):
+    """
+    Stream the records of a game file, reading one record at a time.
+    Args:
+        path (str): Game file written by GameRecordWriter
+    Returns:
+        generator of GameRecord
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a game record file" % path)
+        while True:
+            prefix = f.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            length, = LENGTH.unpack(prefix)
+            data = f.read(length)
+            if len(data) < length:
+                # the writer died halfway through this record
+                return
+            yield decode_record(data)
+
+
+def replay(record, engine="bitboard"):
+    """
+    Play a record out on a new board, impact craters included, yielding the position before the first
+    move and after every move. The moves go through the same code as in play (Board.__apply_move__), so
+    every position is exactly the one the players saw. The move that ended the game is not applied if it
+    timed out (play_isolation never applied it, legal or not) or was illegal.
+    The same Board object is yielded every time and changed in place by the next move; copy() it to keep
+    a position.
+    Args:
+        record (GameRecord): The game
+        engine (str): Board engine
+    Returns:
+        generator of Board
+    """
+    # stand-ins named after the original players, so the board's queen names match the record
+    player_1 = type(record.player_1, (), {})()
+    player_2 = type(record.player_2, (), {})()
+    board = Board(player_1, player_2, record.width, record.height, engine=engine)
+    yield board
+    moves = record.moves[:-1] if record.termination == TIMED_OUT else record.moves
+    for move in moves:
+        if move not in board.get_active_moves():
+            return
+        is_over, winner = board.__apply_move__(move)
+        yield board
+        if is_over:
+            return
@@ -1,7 +1,13 @@
 from argparse import ArgumentError
 from copy import deepcopy
+import json
 import time
 import platform
+import random
+import struct
+import cProfile
+import pstats
+import tracemalloc
 # import io
 from io import StringIO
 
@@ -9,6 +15,12 @@ from io import StringIO
 if platform.system() != 'Windows':
     import resource
 
+# numpy is only needed for the batched mobility counts (get_children_mobility)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 import sys
 import os
 
@@ -20,10 +32,29 @@ class Board:
     BLOCKED = "X"
     TRAIL = "O"
     NOT_MOVED = (-1, -1)
+    ENGINES = ("list", "bitboard")
+    DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1),
+                  (0, -1), (0, 1),
+                  (1, -1), (1, 0), (1, 1))
+
+    def __new__(cls, player_1=None, player_2=None, width=9, height=9, engine="list"):
+        """
+        Pick the class that backs the board. engine="list" keeps the physical state as a list of lists
+        of strings, engine="bitboard" packs it into Python ints (see BitBoard). Both expose the same API.
+        """
+        if engine not in Board.ENGINES:
+            raise ValueError("Unknown board engine: " + str(engine))
+        if cls is Board and engine == "bitboard":
+            cls = BitBoard
+        return object.__new__(cls)
 
-    def __init__(self, player_1, player_2, width=9, height=9):
+    def __init__(self, player_1, player_2, width=9, height=9, engine="list"):
         self.width = width
         self.height = height
+        self.engine = engine
+
+        # shared per board size, see _ray_table
+        self.__rays__ = _ray_table(width, height)
 
         self.__player_1__ = player_1
         self.__player_2__ = player_2
@@ -44,6 +75,50 @@ class Board:
 
         self.move_count = 0
 
+        # one entry per applied move, consumed by pop_move
+        self.__undo_stack__ = []
+
+        # Zobrist hash of the position, updated on every move (see _zobrist_keys)
+        self.__zobrist_keys__ = _zobrist_keys(width, height)
+        self.__queen_keys__ = {self.__queen_1__: self.__zobrist_keys__[1], self.__queen_2__: self.__zobrist_keys__[2]}
+        self.__zobrist__ = 0
+
+        # mobility of both queens, updated on every move (see __update_mobility__)
+        self.__alignment__ = _ray_alignment(width, height)
+        self.__reset_mobility__()
+
+        # Zobrist hashes of the position under every board symmetry, only kept once
+        # track_symmetries() was called (see get_canonical_hash)
+        self.__symmetries__ = _symmetries(width, height)
+        self.__symmetric_hashes__ = None
+        self.__symmetry_stack__ = []
+
+    # lookup tables shared by every board of a size, left out of pickles (see __getstate__)
+    __tables__ = ("__rays__", "__alignment__", "__zobrist_keys__", "__queen_keys__", "__symmetries__")
+
+    def __getstate__(self):
+        """
+        The per-size lookup tables stay behind when the board is pickled; __setstate__ fetches them from
+        the module caches again, so an unpickled board shares them like any other.
+        """
+        state = self.__dict__.copy()
+        for name in self.__tables__:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__load_tables__()
+
+    def __load_tables__(self):
+        """Attach the shared lookup tables of the board's size."""
+        width, height = self.width, self.height
+        self.__rays__ = _ray_table(width, height)
+        self.__alignment__ = _ray_alignment(width, height)
+        self.__zobrist_keys__ = _zobrist_keys(width, height)
+        self.__queen_keys__ = {self.__queen_1__: self.__zobrist_keys__[1], self.__queen_2__: self.__zobrist_keys__[2]}
+        self.__symmetries__ = _symmetries(width, height)
+
     def get_state(self):
         """
         Get physical board state
@@ -93,6 +168,238 @@ class Board:
             self.__inactive_players_queen__ = self.__queen_1__
         # Count X's to get move count + 2 for initial moves
         self.move_count = sum(row.count('X') + row.count('Q1') + row.count('Q2') for row in board_state)
+        self.__undo_stack__ = []
+        self.__zobrist__ = self.__compute_zobrist__()
+        self.__reset_mobility__()
+        self.__reset_symmetries__()
+
+    def to_bytes(self):
+        """
+        Pack the position into PACKED_HEADER followed by the occupancy bitmask (get_occupancy_mask) in
+        (width * height + 7) // 8 bytes, little endian: packed_size(width, height) bytes for every board
+        of that size. The players are not part of it, and trail marks come back as blocked spaces.
+        Parameters:
+            None
+        Returns:
+            bytes: Packed position, see from_bytes
+        """
+        w = self.width
+        indices = []
+        for queen in (self.__queen_1__, self.__queen_2__):
+            position = self.__last_queen_move__[queen]
+            indices.append(PACKED_NOT_MOVED if position == Board.NOT_MOVED else position[0] * w + position[1])
+        side = 1 if self.__active_players_queen__ == self.__queen_1__ else 2
+        return (PACKED_HEADER.pack(w, self.height, indices[0], indices[1], side, self.move_count) +
+                self.get_occupancy_mask().to_bytes((w * self.height + 7) // 8, "little"))
+
+    @staticmethod
+    def packed_size(width, height):
+        """
+        Parameters:
+            width, height: int, Board size
+        Returns:
+            int: Length of to_bytes() of a board of that size
+        """
+        return PACKED_HEADER.size + (width * height + 7) // 8
+
+    @staticmethod
+    def from_bytes(data, player_1, player_2, engine="bitboard"):
+        """
+        Build a board from a position packed by to_bytes.
+        Parameters:
+            data: bytes-like, Packed position (bytes, memoryview into shared memory, ...); anything after
+            packed_size(width, height) bytes is ignored
+            player_1, player_2: Players of queen 1 and 2, as for Board()
+            engine: str, Board engine
+        Returns:
+            Board: The position, with an empty move history
+        """
+        width, height, index_1, index_2, side, move_count = PACKED_HEADER.unpack_from(data, 0)
+        end = PACKED_HEADER.size + (width * height + 7) // 8
+        occupied = int.from_bytes(data[PACKED_HEADER.size:end], "little")
+        board = Board(player_1, player_2, width, height, engine=engine)
+        positions = [Board.NOT_MOVED if index == PACKED_NOT_MOVED else (index // width, index % width)
+                     for index in (index_1, index_2)]
+        board.__set_packed_state__(occupied, positions, side == 1, move_count)
+        return board
+
+    def __set_packed_state__(self, occupied, positions, p1_turn, move_count):
+        """
+        Load an unpacked to_bytes() position. Like set_state, but from the occupancy mask.
+        Parameters:
+            occupied: int, Occupancy bitmask, queen spaces included
+            positions: [(int, int)], Positions of queen 1 and 2
+            p1_turn: bool, Flag to determine which player is active
+            move_count: int, Moves played
+        """
+        w = self.width
+        state = [[Board.BLOCKED if occupied >> (col * w + row) & 1 else Board.BLANK for row in range(0, w)]
+                 for col in range(0, self.height)]
+        for queen, position in zip((self.__queen_1__, self.__queen_2__), positions):
+            if position != Board.NOT_MOVED:
+                state[position[0]][position[1]] = self.__queen_symbols__[queen]
+        self.set_state(state, p1_turn)
+        self.move_count = move_count
+
+    def get_zobrist_hash(self):
+        """
+        Get the Zobrist hash of the position: blocked spaces, both queen positions and the side to move.
+        It is kept up to date incrementally, so reading it is free.
+        Parameters:
+            None
+        Returns:
+            int: 64 bit hash of the position
+        """
+        return self.__zobrist__
+
+    def __compute_zobrist__(self):
+        """
+        Compute the Zobrist hash of the position from scratch.
+        Parameters:
+            None
+        Returns:
+            int: 64 bit hash of the position
+        """
+        blocked_keys, q1_keys, q2_keys, side_key = self.__zobrist_keys__
+        state = self.__board_state__
+        h = 0
+        for col in range(0, self.height):
+            for row in range(0, self.width):
+                if state[col][row] != Board.BLANK and not self.is_spot_queen(col, row):
+                    h ^= blocked_keys[col * self.width + row]
+        for queen, keys in ((self.__queen_1__, q1_keys), (self.__queen_2__, q2_keys)):
+            position = self.__last_queen_move__[queen]
+            if position != Board.NOT_MOVED:
+                h ^= keys[position[0] * self.width + position[1]]
+        if self.__active_players_queen__ == self.__queen_2__:
+            h ^= side_key
+        return h
+
+    def track_symmetries(self):
+        """
+        Start keeping the Zobrist hash of the position under every board symmetry up to date on each move,
+        which makes get_canonical_hash free. Square boards have 8 symmetries (rotations and reflections),
+        others 4; queen moves and impact craters look the same under all of them.
+        Parameters:
+            None
+        Returns:
+            None
+        """
+        if self.__symmetric_hashes__ is None:
+            self.__symmetric_hashes__ = self.__compute_symmetric_hashes__()
+            self.__symmetry_stack__ = []
+
+    def get_canonical_hash(self):
+        """
+        Get a hash that is the same for all symmetric versions of the position: the smallest Zobrist hash
+        of the position under any board symmetry. Moves are turned into and out of that orientation with
+        to_canonical and from_canonical.
+        Parameters:
+            None
+        Returns:
+            (int, int): Canonical hash, and the symmetry that maps the position onto its canonical orientation
+        """
+        hashes = self.__symmetric_hashes__
+        if hashes is None:
+            hashes = self.__compute_symmetric_hashes__()
+        canonical = min(hashes)
+        return canonical, hashes.index(canonical)
+
+    def to_canonical(self, move, symmetry):
+        """
+        Map a move into the canonical orientation.
+        Parameters:
+            move: (int, int), Move on this board. Takes the form of (column, row).
+            symmetry: int, Symmetry from get_canonical_hash
+        Returns:
+            (int, int): The same move on the canonical board; moves that are not on the board are returned as is
+        """
+        if not self.move_is_in_board(move[0], move[1]):
+            return move
+        index = self.__symmetries__[symmetry][move[0] * self.width + move[1]]
+        return index // self.width, index % self.width
+
+    def from_canonical(self, move, symmetry):
+        """
+        Map a move from the canonical orientation back onto this board, the inverse of to_canonical.
+        Parameters:
+            move: (int, int), Move on the canonical board. Takes the form of (column, row).
+            symmetry: int, Symmetry from get_canonical_hash
+        Returns:
+            (int, int): The same move on this board; moves that are not on the board are returned as is
+        """
+        if not self.move_is_in_board(move[0], move[1]):
+            return move
+        index = self.__symmetries__[symmetry].index(move[0] * self.width + move[1])
+        return index // self.width, index % self.width
+
+    def __compute_symmetric_hashes__(self):
+        """
+        Compute the Zobrist hash of the position under every symmetry from scratch. Hash i is the Zobrist
+        hash of the board transformed by symmetry i, so it uses the same keys as __compute_zobrist__.
+        Parameters:
+            None
+        Returns:
+            (int): One hash per symmetry, the first one for the identity
+        """
+        blocked_keys, q1_keys, q2_keys, side_key = self.__zobrist_keys__
+        state = self.__board_state__
+        blocked = [col * self.width + row for col in range(0, self.height) for row in range(0, self.width)
+                   if state[col][row] != Board.BLANK and not self.is_spot_queen(col, row)]
+        hashes = []
+        for symmetry in self.__symmetries__:
+            h = 0
+            for index in blocked:
+                h ^= blocked_keys[symmetry[index]]
+            for queen, keys in ((self.__queen_1__, q1_keys), (self.__queen_2__, q2_keys)):
+                position = self.__last_queen_move__[queen]
+                if position != Board.NOT_MOVED:
+                    h ^= keys[symmetry[position[0] * self.width + position[1]]]
+            if self.__active_players_queen__ == self.__queen_2__:
+                h ^= side_key
+            hashes.append(h)
+        return tuple(hashes)
+
+    def __reset_symmetries__(self):
+        """
+        Recompute the symmetric hashes from scratch if they are tracked, after the board was changed other
+        than through __apply_move__.
+        """
+        if self.__symmetric_hashes__ is not None:
+            self.__symmetric_hashes__ = self.__compute_symmetric_hashes__()
+            self.__symmetry_stack__ = []
+
+    def __update_symmetric_hashes__(self, queen_move, my_pos, filled):
+        """
+        Update every symmetric hash for the active queen moving from my_pos to queen_move and filling the
+        crater spaces filled (indices), the same way __apply_move__ updates the Zobrist hash.
+        """
+        self.__symmetry_stack__.append(self.__symmetric_hashes__)
+        w = self.width
+        blocked_keys = self.__zobrist_keys__[0]
+        side_key = self.__zobrist_keys__[3]
+        queen_keys = self.__queen_keys__[self.__active_players_queen__]
+        destination = queen_move[0] * w + queen_move[1]
+        origin = my_pos[0] * w + my_pos[1] if my_pos != Board.NOT_MOVED else None
+        hashes = []
+        for symmetry, h in zip(self.__symmetries__, self.__symmetric_hashes__):
+            h ^= side_key ^ queen_keys[symmetry[destination]]
+            if origin is not None:
+                h ^= queen_keys[symmetry[origin]] ^ blocked_keys[symmetry[origin]]
+            for index in filled:
+                h ^= blocked_keys[symmetry[index]]
+            hashes.append(h)
+        self.__symmetric_hashes__ = tuple(hashes)
+
+    def __restore_symmetric_hashes__(self):
+        """
+        Take back the symmetric hashes saved by the last __update_symmetric_hashes__, or recompute them for
+        a move applied before tracking started.
+        """
+        if self.__symmetry_stack__:
+            self.__symmetric_hashes__ = self.__symmetry_stack__.pop()
+        else:
+            self.__symmetric_hashes__ = self.__compute_symmetric_hashes__()
 
     #function to edit to introduce any variant - edited for impact crater variant by Matthew Zhou (1/23/2023)
     def __apply_move__(self, queen_move):
@@ -108,6 +415,7 @@ class Board:
         col, row = queen_move
         my_pos = self.__last_queen_move__[self.__active_players_queen__]
         #opponent_pos = self.__last_queen_move__[self.__inactive_players_queen__]
+        crater = []
 
         ######Change the following lines to introduce any variant######
         if my_pos != Board.NOT_MOVED:
@@ -115,12 +423,31 @@ class Board:
         
             #check if queen moves more than 1 space in any direction
             if abs(col - my_pos[0]) > 1 or abs(row - my_pos[1]) > 1:
-                self.__create_crater__(queen_move)
+                crater = self.__create_crater__(queen_move)
        ######Change above lines to introduce any variant######
+
+        # remember what pop_move needs to take this move back
+        self.__undo_stack__.append((queen_move, my_pos, crater, self.__zobrist__))
+
+        # keep the Zobrist hash in step with the spaces that changed
+        w = self.width
+        blocked_keys = self.__zobrist_keys__[0]
+        queen_keys = self.__queen_keys__[self.__active_players_queen__]
+        h = self.__zobrist__ ^ self.__zobrist_keys__[3] ^ queen_keys[col * w + row]
+        if my_pos != Board.NOT_MOVED:
+            h ^= queen_keys[my_pos[0] * w + my_pos[1]] ^ blocked_keys[my_pos[0] * w + my_pos[1]]
+        filled = []
+        for adj_col, adj_row in crater:
+            h ^= blocked_keys[adj_col * w + adj_row]
+            filled.append(adj_col * w + adj_row)
+        self.__zobrist__ = h
         
         # apply move of active player
         self.__last_queen_move__[self.__active_players_queen__] = queen_move
         self.__board_state__[col][row] = self.__queen_symbols__[self.__active_players_queen__]
+        self.__update_mobility__(queen_move, filled)
+        if self.__symmetric_hashes__ is not None:
+            self.__update_symmetric_hashes__(queen_move, my_pos, filled)
 
 
         # rotate the players
@@ -133,7 +460,7 @@ class Board:
         self.move_count = self.move_count + 1
 
         # If opponent is isolated
-        if not self.get_active_moves():
+        if not self.__queen_mobility__(self.__active_players_queen__):
             return True, self.__inactive_players_queen__
 
         return False, None
@@ -146,14 +473,59 @@ class Board:
             queen_move: (int, int), Desired move to apply. Takes the 
             form of (column, row).
         Returns:
-            None
+            [(int, int)]: Spaces that were blank and got filled by the crater
         '''
         col, row = queen_move
         impact_crater = [(col - 1, row), (col, row - 1), (col, row + 1), (col + 1, row)]
+        filled = []
         for adj_col, adj_row in impact_crater:
             if self.move_is_in_board(adj_col, adj_row):
                 if self.__board_state__[adj_col][adj_row] == Board.BLANK:
                     self.__board_state__[adj_col][adj_row] = Board.BLOCKED
+                    filled.append((adj_col, adj_row))
+        return filled
+
+    def push_move(self, queen_move):
+        '''
+        Apply a move in place and remember how to take it back with pop_move. Lets a search walk the
+        game tree on a single board instead of building a new one per node through forecast_move.
+        Parameters:
+            queen_move: (int, int), Desired move to apply. Takes the
+            form of (column, row). Move must be legal.
+        Returns:
+            result: (bool, str), Game Over flag, winner
+        '''
+        return self.__apply_move__(queen_move)
+
+    def pop_move(self):
+        '''
+        Take back the last move applied through push_move (or __apply_move__): frees the destination,
+        puts the queen back on the space it vacated, clears the crater it created, rotates the players
+        back and decrements the move count.
+        Parameters:
+            None
+        Returns:
+            (int, int): The move that was taken back
+        '''
+        queen_move, my_pos, crater, self.__zobrist__ = self.__undo_stack__.pop()
+        self.__restore_mobility__()
+
+        # rotate the players and queens back
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        self.__active_players_queen__, self.__inactive_players_queen__ = self.__inactive_players_queen__, self.__active_players_queen__
+        self.move_count = self.move_count - 1
+
+        state = self.__board_state__
+        state[queen_move[0]][queen_move[1]] = Board.BLANK
+        for adj_col, adj_row in crater:
+            state[adj_col][adj_row] = Board.BLANK
+        if my_pos != Board.NOT_MOVED:
+            state[my_pos[0]][my_pos[1]] = self.__queen_symbols__[self.__active_players_queen__]
+        self.__last_queen_move__[self.__active_players_queen__] = my_pos
+        if self.__symmetric_hashes__ is not None:
+            self.__restore_symmetric_hashes__()
+
+        return queen_move
 
     def copy(self):
         '''
@@ -176,6 +548,10 @@ class Board:
         b.__active_players_queen__ = self.__active_players_queen__
         b.__inactive_players_queen__ = self.__inactive_players_queen__
         b.move_count = self.move_count
+        b.__zobrist__ = self.__zobrist__
+        b.__mobility__ = self.__mobility__
+        b.__open_spaces__ = self.__open_spaces__
+        b.__symmetric_hashes__ = self.__symmetric_hashes__
 
         return b
 
@@ -371,6 +747,170 @@ class Board:
         else:
             raise ValueError("No value for my_player!")
 
+    def get_active_mobility(self):
+        """
+        Get the number of legal moves of active player. Kept up to date on every move, so reading it is free.
+        Parameters:
+            None
+        Returns:
+           int: Number of legal moves
+        """
+        return self.__queen_mobility__(self.__active_players_queen__)
+
+    def get_inactive_mobility(self):
+        """
+        Get the number of legal moves of inactive player. Kept up to date on every move, so reading it is free.
+        Parameters:
+            None
+        Returns:
+           int: Number of legal moves
+        """
+        return self.__queen_mobility__(self.__inactive_players_queen__)
+
+    def get_player_mobility(self, my_player=None):
+        """
+        Get the number of legal moves of certain player object. Same as len(get_player_moves(my_player))
+        without building the list.
+        Parameters:
+            my_player (Player), Player to count moves for
+            If calling from within a player class, my_player = self can be passed.
+        returns
+            int: Number of legal moves
+        """
+        if (my_player == self.__player_1__ and self.__active_player__ == self.__player_1__):
+            return self.get_active_mobility()
+        if (my_player == self.__player_1__ and self.__active_player__ != self.__player_1__):
+            return self.get_inactive_mobility()
+        elif (my_player == self.__player_2__ and self.__active_player__ == self.__player_2__):
+            return self.get_active_mobility()
+        elif (my_player == self.__player_2__ and self.__active_player__ != self.__player_2__):
+            return self.get_inactive_mobility()
+        else:
+            raise ValueError("No value for my_player!")
+
+    def get_opponent_mobility(self, my_player=None):
+        """
+        Get the number of legal moves of the opponent of the player provided. Same as
+        len(get_opponent_moves(my_player)) without building the list.
+        Parameters:
+            my_player (Player), The player facing the opponent in question
+            If calling from within a player class, my_player = self can be passed.
+        returns
+            int: Number of opponent's legal moves
+        """
+        if (my_player == self.__player_1__ and self.__active_player__ == self.__player_1__):
+            return self.get_inactive_mobility()
+        if (my_player == self.__player_1__ and self.__active_player__ != self.__player_1__):
+            return self.get_active_mobility()
+        elif (my_player == self.__player_2__ and self.__active_player__ == self.__player_2__):
+            return self.get_inactive_mobility()
+        elif (my_player == self.__player_2__ and self.__active_player__ != self.__player_2__):
+            return self.get_active_mobility()
+        else:
+            raise ValueError("No value for my_player!")
+
+    def get_open_spaces(self):
+        """
+        Number of blank spaces on the board, from the incrementally kept count.
+        Parameters:
+            None
+        Returns:
+            int: Blank spaces
+        """
+        return self.__open_spaces__
+
+    def __queen_mobility__(self, queen):
+        """
+        Number of legal moves of a queen, from the incrementally kept counts. Not meant to be directly
+        called, use get_active_mobility or get_inactive_mobility instead.
+        Parameters:
+            queen: str, Queen name
+        Returns:
+            int: Number of legal moves
+        """
+        if self.__last_queen_move__[queen] == Board.NOT_MOVED:
+            return self.__open_spaces__
+        return self.__mobility__[queen][0]
+
+    def __ray_reach__(self, move):
+        """
+        Number of blank spaces along each ray of a queen before the first space that is not blank.
+        Parameters:
+            move: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+           (int): One count per entry of the queen's ray table row, () for Board.NOT_MOVED
+        """
+        if move == Board.NOT_MOVED:
+            return ()
+        state = self.__board_state__
+        reach = []
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            count = 0
+            for cell, bit in ray:
+                if state[cell[0]][cell[1]] != Board.BLANK:
+                    break
+                count += 1
+            reach.append(count)
+        return tuple(reach)
+
+    def __reset_mobility__(self):
+        """
+        Recompute the mobility counts of both queens from scratch, after the board was changed other than
+        through __apply_move__.
+        """
+        self.__open_spaces__ = self.__count_moves__(Board.NOT_MOVED)
+        self.__mobility__ = {}
+        for queen, position in self.__last_queen_move__.items():
+            reach = self.__ray_reach__(position)
+            self.__mobility__[queen] = (sum(reach), reach)
+        self.__mobility_stack__ = []
+
+    def __update_mobility__(self, queen_move, filled):
+        """
+        Bring the mobility counts up to date after the active queen moved to queen_move (already on the
+        board, players not rotated yet). The mover's rays are counted again. The opponent's counts only
+        change where the destination or a crater space lies on one of its rays, closer than the first
+        space that was already occupied; the vacated space was occupied by the mover before and stays
+        blocked, so it changes nothing. The old counts are saved for __restore_mobility__.
+        Parameters:
+            queen_move: (int, int), Destination of the move
+            filled: [int], Indices (col * width + row) of the crater spaces the move filled
+        """
+        old = self.__mobility__
+        self.__mobility_stack__.append((old, self.__open_spaces__))
+        self.__open_spaces__ -= 1 + len(filled)
+        # a new dict per move, so the saved one stays untouched
+        mobility = self.__mobility__ = dict(old)
+
+        opponent = self.__inactive_players_queen__
+        count, reach = old[opponent]
+        if reach:
+            w = self.width
+            opponent_pos = self.__last_queen_move__[opponent]
+            alignment = self.__alignment__[opponent_pos[0] * w + opponent_pos[1]]
+            new_reach = None
+            for index in [queen_move[0] * w + queen_move[1]] + filled:
+                aligned = alignment.get(index)
+                if aligned is not None:
+                    ray, step = aligned
+                    if new_reach is None:
+                        if step < reach[ray]:
+                            new_reach = list(reach)
+                            new_reach[ray] = step
+                    elif step < new_reach[ray]:
+                        new_reach[ray] = step
+            if new_reach is not None:
+                mobility[opponent] = (sum(new_reach), tuple(new_reach))
+
+        reach = self.__ray_reach__(queen_move)
+        mobility[self.__active_players_queen__] = (sum(reach), reach)
+
+    def __restore_mobility__(self):
+        """
+        Take back the mobility counts saved by the last __update_mobility__.
+        """
+        self.__mobility__, self.__open_spaces__ = self.__mobility_stack__.pop()
+
     def __get_moves__(self, move):
         """
         Get all legal moves of a player on current board state as a list of possible moves. Not meant to be directly called, 
@@ -386,25 +926,58 @@ class Board:
         if move == self.NOT_MOVED:
             return self.get_first_moves()
 
-        c, r = move
+        state = self.__board_state__
+        moves = []
 
-        directions = [(-1, -1), (-1, 0), (-1, 1),
-                      (0, -1), (0, 1),
-                      (1, -1), (1, 0), (1, 1)]
+        # rays from the precomputed table already stop at the edge of the board and never overlap
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            for cell, bit in ray:
+                if state[cell[0]][cell[1]] != Board.BLANK:
+                    break
+                moves.append(cell)
 
-        moves = []
+        return moves
 
-        for direction in directions:
-            for dist in range(1, max(self.height, self.width)):
-                col = direction[0] * dist + c
-                row = direction[1] * dist + r
-                if self.move_is_in_board(col, row) and self.is_spot_open(col, row) and (col, row) not in moves:
-                    moves.append((col, row))
+    def __count_moves__(self, move):
+        """
+        Number of legal moves of a player, without building the list of moves. Not meant to be directly
+        called, use get_active_mobility or get_inactive_mobility instead.
+        Parameters:
+            move: (int, int), Last move made by player in question (where they currently are).
+            Takes the form of (column, row).
+        Returns:
+           int: Number of legal moves, same as len(self.__get_moves__(move))
+        """
+        state = self.__board_state__
+        if move == self.NOT_MOVED:
+            return sum(line.count(Board.BLANK) for line in state)
 
-                else:
+        count = 0
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            for cell, bit in ray:
+                if state[cell[0]][cell[1]] != Board.BLANK:
                     break
+                count += 1
+        return count
 
-        return moves
+    def __has_moves__(self, move):
+        """
+        Whether a player has any legal move. Only the first space of each ray has to be checked.
+        Parameters:
+            move: (int, int), Last move made by player in question (where they currently are).
+            Takes the form of (column, row).
+        Returns:
+           bool: Same as bool(self.__get_moves__(move))
+        """
+        state = self.__board_state__
+        if move == self.NOT_MOVED:
+            return any(Board.BLANK in line for line in state)
+
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            cell = ray[0][0]
+            if state[cell[0]][cell[1]] == Board.BLANK:
+                return True
+        return False
 
     def get_first_moves(self):
         """
@@ -418,6 +991,119 @@ class Board:
         return [(i, j) for i in range(0, self.height)
                 for j in range(0, self.width) if self.__board_state__[i][j] == Board.BLANK]
 
+    def get_region(self, position):
+        """
+        Get the blank spaces a queen on position could ever reach: the area of blank spaces connected
+        to it through horizontal, vertical or diagonal neighbours (flood fill). Every queen move slides
+        over such neighbours, so no move leaves the area.
+        Parameters:
+            position: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+            set((int, int)): Reachable blank spaces; every blank space for a queen that has not moved
+        """
+        if position == Board.NOT_MOVED:
+            return set(self.get_first_moves())
+
+        region = set()
+        frontier = [position]
+        while frontier:
+            col, row = frontier.pop()
+            # the first space of each ray is a neighbour
+            for ray in self.__rays__[col * self.width + row]:
+                cell = ray[0][0]
+                if cell not in region and self.is_spot_open(cell[0], cell[1]):
+                    region.add(cell)
+                    frontier.append(cell)
+        return region
+
+    def get_region_mask(self, position):
+        """
+        Get the region of a queen (see get_region) as a bitmask, bit (column * width + row) for space
+        (column, row).
+        Parameters:
+            position: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+            int: Bitmask of the reachable blank spaces
+        """
+        mask = 0
+        for col, row in self.get_region(position):
+            mask |= 1 << (col * self.width + row)
+        return mask
+
+    def is_partitioned(self):
+        """
+        Check whether the two queens are walled off from each other, i.e. their regions (see get_region)
+        share no space. From then on each queen can only use up its own region: blocking a space or
+        creating a crater never opens one, so the regions stay separate for the rest of the game, and
+        the player that can make more moves in its own region wins.
+        Parameters:
+            None
+        Returns:
+            bool: Whether both queens are on the board and their regions are disjoint
+        """
+        position_1 = self.__last_queen_move__[self.__queen_1__]
+        position_2 = self.__last_queen_move__[self.__queen_2__]
+        if position_1 == Board.NOT_MOVED or position_2 == Board.NOT_MOVED:
+            return False
+        return self.get_region(position_1).isdisjoint(self.get_region(position_2))
+
+    def get_occupancy_mask(self):
+        """
+        Get the spaces that are not blank as a bitmask, bit (column * width + row) for space (column, row).
+        Queen spaces count as occupied.
+        Parameters:
+            None
+        Returns:
+            int: Occupancy bitmask
+        """
+        mask = 0
+        for col in range(0, self.height):
+            for row in range(0, self.width):
+                if self.__board_state__[col][row] != Board.BLANK:
+                    mask |= 1 << (col * self.width + row)
+        return mask
+
+    def get_children_occupancy(self, moves):
+        """
+        Get the occupancy bitmask (see get_occupancy_mask) of the board after each of the active
+        player's moves, impact craters included, without applying the moves.
+        Parameters:
+            moves: [(int, int)], Legal moves of the active player
+        Returns:
+            [int]: One occupancy bitmask per move
+        """
+        w = self.width
+        occupied = self.get_occupancy_mask()
+        craters = _crater_masks(w, self.height)
+        my_pos = self.__last_queen_move__[self.__active_players_queen__]
+        masks = []
+        for col, row in moves:
+            index = col * w + row
+            mask = occupied | (1 << index)
+            # the old queen space is occupied already; a long move adds its crater
+            if my_pos != Board.NOT_MOVED and (abs(col - my_pos[0]) > 1 or abs(row - my_pos[1]) > 1):
+                mask |= craters[index]
+            masks.append(mask)
+        return masks
+
+    def get_children_mobility(self, moves):
+        """
+        Count the legal moves of both players after each of the active player's moves, for all moves
+        at once with numpy (see batch_mobility) instead of one board at a time.
+        Parameters:
+            moves: [(int, int)], Legal moves of the active player
+        Returns:
+            (numpy.ndarray, numpy.ndarray): Number of legal moves of the player that moved (now the
+            inactive player) and of its opponent (now the active player), one entry per move. A 0 in the
+            second array means that move ends the game.
+        """
+        masks = self.get_children_occupancy(moves)
+        opponent = self.__last_queen_move__[self.__inactive_players_queen__]
+        # both queens in one batch: every child board twice
+        counts = batch_mobility(occupancy_array(masks + masks, self.width, self.height),
+                                list(moves) + [opponent] * len(moves), self.width, self.height)
+        return counts[:len(moves)], counts[len(moves):]
+
     def move_is_in_board(self, col, row):
         """
         Sanity check for making sure a move is within the bounds of the board.
@@ -508,16 +1194,70 @@ class Board:
 
         return out
 
-    def play_isolation(self, time_limit=10000, print_moves=False):
+    def end_game(self):
+        """
+        Tell both players the game is over, so they can stop background work (e.g. pondering).
+        Players without an end_game method are skipped. play_isolation calls this when the game ends;
+        code that runs its own game loop should call it too.
+        Parameters:
+            None
+        Returns:
+            None
+        """
+        for player in (self.__player_1__, self.__player_2__):
+            end_game = getattr(player, "end_game", None)
+            if end_game is not None:
+                end_game()
+
+    def play_isolation(self, time_limit=10000, print_moves=False, stats_file=None, profiler=None, profile_file=None):
         """
         Method to play out a game of isolation with the agents passed into the Board class.
         Initializes and updates move_history variable, enforces timeouts, and prints the game.
         Parameters:
             time_limit: int, time limit in milliseconds that each player has before they time out.
             print_moves: bool, Should the method print details of the game in real time
+            stats_file: str, If given, after every move the search statistics of players that collect
+            them (a search_stats attribute with an as_dict method, see submission.SearchStats) are
+            recorded, and written to this file as JSON when the game ends.
+            profiler: MoveProfiler, If given, every move is profiled into it; read profiler.report()
+            after the game.
+            profile_file: str, If given, the MoveProfiler report (of profiler, or of a default one) is
+            written to this file as JSON when the game ends.
         Returns:
             (str, [(int, int)], str): Queen of Winner, Move history, Reason for game over.
-            Each move in move history takes the form of (column, row).
+            Each move in move history takes the form of (column, row). If queen 2 is to move when the
+            game starts (after an odd number of opening moves), the first entry is [None, move].
+        """
+        if profile_file is not None and profiler is None:
+            profiler = MoveProfiler()
+        if stats_file is None and profiler is None:
+            try:
+                return self.__play_isolation__(time_limit, print_moves, None, None)
+            finally:
+                self.end_game()
+
+        move_stats = [] if stats_file is not None else None
+        result = None
+        try:
+            result = self.__play_isolation__(time_limit, print_moves, move_stats, profiler)
+            return result
+        finally:
+            self.end_game()
+            if profiler is not None:
+                profiler.finish(result)
+                if profile_file is not None:
+                    with open(profile_file, "w") as f:
+                        json.dump(profiler.report(), f, indent=1)
+            if stats_file is not None:
+                with open(stats_file, "w") as f:
+                    json.dump({"winner": result[0] if result else None,
+                               "termination": result[2] if result else None,
+                               "moves": move_stats}, f, indent=1)
+
+    def __play_isolation__(self, time_limit, print_moves, move_stats, profiler):
+        """
+        Game loop behind play_isolation. Appends a record per move to move_stats unless it is None, and
+        profiles every move into profiler unless it is None.
         """
         move_history = []
 
@@ -530,26 +1270,41 @@ class Board:
 
         while True:
             game_copy = self.copy()
-            move_start = curr_time_millis()
-
-            def time_left():
-                # print("Limit: "+str(time_limit) +" - "+str(curr_time_millis()-move_start))
-                return time_limit - (curr_time_millis() - move_start)
-
             if print_moves:
                 print("\n", self.__active_players_queen__, " Turn")
+            if profiler is not None:
+                profiler.start_move(self)
+            move_start = curr_time_millis()
+            # players get a cheap monotonic clock; timeouts are still judged on curr_time_millis
+            deadline = Deadline(time_limit)
 
             curr_move = self.__active_player__.move(
-                game_copy, time_left)  # queen added in return
-
-            # Append new move to game history
+                game_copy, deadline)  # queen added in return
+            # the move's time is taken before any bookkeeping, which is not charged to the player
+            move_time = curr_time_millis() - move_start
+
+            if profiler is not None:
+                profiler.end_move(self, curr_move, move_time)
+
+            if move_stats is not None:
+                stats = getattr(self.__active_player__, "search_stats", None)
+                if stats is not None:
+                    move_stats.append({"move_number": self.move_count,
+                                       "queen": self.__active_players_queen__,
+                                       "move": curr_move,
+                                       "time_left": time_limit - move_time,
+                                       "stats": stats.as_dict()})
+
+            # Append new move to game history; a game handed over with queen 2 to move starts with [None, move]
             if self.__active_player__ == self.__player_1__:
                 move_history.append([curr_move])
+            elif not move_history:
+                move_history.append([None, curr_move])
             else:
                 move_history[-1].append(curr_move)
 
             # Handle Timeout
-            if time_limit and time_left() <= 0:
+            if time_limit and time_limit - move_time <= 0:
                 return self.__inactive_players_queen__, move_history, \
                        (self.__active_players_queen__ + " timed out.")
 
@@ -611,6 +1366,1012 @@ class Board:
         self.__inactive_players_queen__ = tmp
 
         self.move_count = self.move_count + 1
+        self.__zobrist__ = self.__compute_zobrist__()
+        self.__reset_mobility__()
+        self.__reset_symmetries__()
+
+
+class BitBoard(Board):
+    """
+    Board engine that packs the physical state into Python ints instead of a list of lists of strings.
+    Bit (col * width + row) of a mask stands for the space at (col, row). Copies only duplicate a handful
+    of ints, which is what makes forecast_move cheap at depth. Create one with
+    Board(player_1, player_2, width, height, engine="bitboard").
+    It is also the engine for large boards (15x15 and up): copies, moves, mobility counts and therefore
+    the open move evaluation work per ray with a few int operations each, never per space, so their cost
+    grows with the number of moves rather than with the board area (see benchmark.py --scaling).
+    """
+
+    def __init__(self, player_1, player_2, width=9, height=9, engine="bitboard"):
+        # every space that is not blank (blocked, trail or queen)
+        self.__occupied__ = 0
+        # spaces holding an X
+        self.__blocked__ = 0
+        # spaces holding a trail mark (only ever created through set_state)
+        self.__trail__ = 0
+        self.__crater_masks__ = _crater_masks(width, height)
+        self.__ray_masks__ = _ray_masks(width, height)
+        Board.__init__(self, player_1, player_2, width, height, engine="bitboard")
+
+    __tables__ = Board.__tables__ + ("__crater_masks__", "__ray_masks__")
+
+    def __load_tables__(self):
+        Board.__load_tables__(self)
+        self.__crater_masks__ = _crater_masks(self.width, self.height)
+        self.__ray_masks__ = _ray_masks(self.width, self.height)
+
+    @property
+    def __board_state__(self):
+        """
+        Read-only list of lists view of the packed state, in the same format the list engine stores.
+        Writing into the returned lists does not change the board; use set_state for that.
+        """
+        w = self.width
+        state = [[Board.BLANK for i in range(0, self.width)] for j in range(0, self.height)]
+        for col in range(0, self.height):
+            for row in range(0, w):
+                bit = 1 << (col * w + row)
+                if self.__occupied__ & bit:
+                    state[col][row] = Board.TRAIL if self.__trail__ & bit else Board.BLOCKED
+        for queen, position in self.__last_queen_move__.items():
+            if position != Board.NOT_MOVED:
+                state[position[0]][position[1]] = self.__queen_symbols__[queen]
+        return state
+
+    @__board_state__.setter
+    def __board_state__(self, board_state):
+        """
+        Pack a list of lists board state into the masks. Queen spaces are only marked as occupied; their
+        positions are tracked in __last_queen_move__ like in the list engine.
+        """
+        w = self.width
+        queen_symbols = self.__queen_symbols__.values() if hasattr(self, "__queen_symbols__") else ()
+        occupied = blocked = trail = 0
+        for col, line in enumerate(board_state):
+            for row, space in enumerate(line):
+                if space == Board.BLANK:
+                    continue
+                bit = 1 << (col * w + row)
+                occupied |= bit
+                if space == Board.TRAIL:
+                    trail |= bit
+                elif space not in queen_symbols:
+                    blocked |= bit
+        self.__occupied__ = occupied
+        self.__blocked__ = blocked
+        self.__trail__ = trail
+
+    def get_state(self):
+        """
+        Get physical board state
+        Parameters:
+            None
+        Returns:
+            State of the board: list[char]
+        """
+        return self.__board_state__
+
+    def __set_packed_state__(self, occupied, positions, p1_turn, move_count):
+        """
+        Load an unpacked to_bytes() position straight into the masks, see Board.__set_packed_state__.
+        """
+        w = self.width
+        queen_bits = 0
+        for queen, position in zip((self.__queen_1__, self.__queen_2__), positions):
+            self.__last_queen_move__[queen] = position
+            if position != Board.NOT_MOVED:
+                queen_bits |= 1 << (position[0] * w + position[1])
+        self.__occupied__ = occupied
+        self.__blocked__ = occupied & ~queen_bits
+        self.__trail__ = 0
+
+        if p1_turn:
+            self.__active_player__, self.__inactive_player__ = self.__player_1__, self.__player_2__
+            self.__active_players_queen__, self.__inactive_players_queen__ = self.__queen_1__, self.__queen_2__
+        else:
+            self.__active_player__, self.__inactive_player__ = self.__player_2__, self.__player_1__
+            self.__active_players_queen__, self.__inactive_players_queen__ = self.__queen_2__, self.__queen_1__
+        self.move_count = move_count
+        self.__undo_stack__ = []
+        self.__zobrist__ = self.__compute_zobrist__()
+        self.__reset_mobility__()
+        self.__reset_symmetries__()
+
+    def __compute_zobrist__(self):
+        """
+        Compute the Zobrist hash of the position from scratch, from the blocked mask.
+        Parameters:
+            None
+        Returns:
+            int: 64 bit hash of the position
+        """
+        blocked_keys, q1_keys, q2_keys, side_key = self.__zobrist_keys__
+        h = 0
+        blocked = self.__occupied__
+        for queen, keys in ((self.__queen_1__, q1_keys), (self.__queen_2__, q2_keys)):
+            position = self.__last_queen_move__[queen]
+            if position != Board.NOT_MOVED:
+                index = position[0] * self.width + position[1]
+                h ^= keys[index]
+                blocked &= ~(1 << index)
+        while blocked:
+            index = blocked.bit_length() - 1
+            h ^= blocked_keys[index]
+            blocked ^= 1 << index
+        if self.__active_players_queen__ == self.__queen_2__:
+            h ^= side_key
+        return h
+
+    #function to edit to introduce any variant - mirrors Board.__apply_move__ on the packed state
+    def __apply_move__(self, queen_move):
+        '''
+        Apply chosen move to a board state and check for game end
+        Parameters:
+            queen_move: (int, int), Desired move to apply. Takes the
+            form of (column, row). Move must be legal.
+        Returns:
+            result: (bool, str), Game Over flag, winner
+        '''
+        col, row = queen_move
+        my_pos = self.__last_queen_move__[self.__active_players_queen__]
+
+        # the masks are plain ints, so saving them is all pop_move needs
+        self.__undo_stack__.append((my_pos, self.__occupied__, self.__blocked__, self.__zobrist__))
+        crater = 0
+
+        ######Change the following lines to introduce any variant######
+        if my_pos != Board.NOT_MOVED:
+            self.__blocked__ |= 1 << (my_pos[0] * self.width + my_pos[1])
+
+            #check if queen moves more than 1 space in any direction
+            if abs(col - my_pos[0]) > 1 or abs(row - my_pos[1]) > 1:
+                crater = self.__create_crater__(queen_move)
+        ######Change above lines to introduce any variant######
+
+        # keep the Zobrist hash in step with the spaces that changed
+        w = self.width
+        blocked_keys = self.__zobrist_keys__[0]
+        queen_keys = self.__queen_keys__[self.__active_players_queen__]
+        h = self.__zobrist__ ^ self.__zobrist_keys__[3] ^ queen_keys[col * w + row]
+        if my_pos != Board.NOT_MOVED:
+            h ^= queen_keys[my_pos[0] * w + my_pos[1]] ^ blocked_keys[my_pos[0] * w + my_pos[1]]
+        filled = []
+        while crater:
+            bit = crater & -crater
+            h ^= blocked_keys[bit.bit_length() - 1]
+            filled.append(bit.bit_length() - 1)
+            crater ^= bit
+        self.__zobrist__ = h
+
+        # apply move of active player
+        self.__last_queen_move__[self.__active_players_queen__] = queen_move
+        self.__occupied__ |= 1 << (col * self.width + row)
+        self.__update_mobility__(queen_move, filled)
+        if self.__symmetric_hashes__ is not None:
+            self.__update_symmetric_hashes__(queen_move, my_pos, filled)
+
+        # rotate the players
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+
+        # rotate the queens
+        self.__active_players_queen__, self.__inactive_players_queen__ = self.__inactive_players_queen__, self.__active_players_queen__
+
+        # increment move count
+        self.move_count = self.move_count + 1
+
+        # If opponent is isolated
+        if not self.__queen_mobility__(self.__active_players_queen__):
+            return True, self.__inactive_players_queen__
+
+        return False, None
+
+    def __create_crater__(self, queen_move):
+        '''
+        Create impact crater - 4 spaces (vertical, horizontal) adjacent to move. Only blank spaces are filled.
+        Parameters:
+            queen_move: (int, int), Desired move to apply. Takes the
+            form of (column, row).
+        Returns:
+            int: Mask of the spaces that got filled by the crater
+        '''
+        col, row = queen_move
+        crater = self.__crater_masks__[col * self.width + row] & ~self.__occupied__
+        self.__blocked__ |= crater
+        self.__occupied__ |= crater
+        return crater
+
+    def pop_move(self):
+        '''
+        Take back the last move applied through push_move (or __apply_move__).
+        Parameters:
+            None
+        Returns:
+            (int, int): The move that was taken back
+        '''
+        my_pos, self.__occupied__, self.__blocked__, self.__zobrist__ = self.__undo_stack__.pop()
+        self.__restore_mobility__()
+
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        self.__active_players_queen__, self.__inactive_players_queen__ = self.__inactive_players_queen__, self.__active_players_queen__
+        self.move_count = self.move_count - 1
+
+        queen_move = self.__last_queen_move__[self.__active_players_queen__]
+        self.__last_queen_move__[self.__active_players_queen__] = my_pos
+        if self.__symmetric_hashes__ is not None:
+            self.__restore_symmetric_hashes__()
+        return queen_move
+
+    def copy(self):
+        '''
+        Create a copy of this board and game state.
+        Parameters:
+            None
+        Returns:
+            Copy of self: BitBoard class
+        '''
+        b = object.__new__(BitBoard)
+        b.__dict__.update(self.__dict__)
+        b.__last_queen_move__ = dict(self.__last_queen_move__)
+        b.__queen_symbols__ = dict(self.__queen_symbols__)
+        b.__undo_stack__ = []
+        b.__mobility_stack__ = []
+        b.__symmetry_stack__ = []
+        return b
+
+    def __get_moves__(self, move):
+        """
+        Get all legal moves of a player on current board state as a list of possible moves. Not meant to be directly called,
+        use get_active_moves or get_inactive_moves instead.
+        Parameters:
+            move: (int, int), Last move made by player in question (where they currently are).
+            Takes the form of (column, row).
+        Returns:
+           [(int, int)]: List of all legal moves. Each move takes the form of
+            (column, row).
+        """
+        if move == self.NOT_MOVED:
+            return self.get_first_moves()
+
+        occupied = self.__occupied__
+        moves = []
+
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            for cell, bit in ray:
+                if occupied & bit:
+                    break
+                moves.append(cell)
+
+        return moves
+
+    def __ray_reach__(self, move):
+        """
+        Number of blank spaces along each ray of a queen before the first occupied space. The first
+        occupied space of a ray is the lowest set bit of its blockers when the ray runs towards higher
+        indices and the highest one otherwise, so no ray is walked space by space (see _ray_masks).
+        Parameters:
+            move: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+           (int): One count per entry of the queen's ray table row, () for Board.NOT_MOVED
+        """
+        if move == Board.NOT_MOVED:
+            return ()
+        occupied = self.__occupied__
+        reach = []
+        for mask, forward, length, steps in self.__ray_masks__[move[0] * self.width + move[1]]:
+            blockers = occupied & mask
+            if not blockers:
+                reach.append(length)
+            elif forward:
+                reach.append(steps[(blockers & -blockers).bit_length()])
+            else:
+                reach.append(steps[blockers.bit_length()])
+        return tuple(reach)
+
+    def __count_moves__(self, move):
+        """
+        Number of legal moves of a player, without building the list of moves.
+        Parameters:
+            move: (int, int), Last move made by player in question (where they currently are).
+            Takes the form of (column, row).
+        Returns:
+           int: Number of legal moves, same as len(self.__get_moves__(move))
+        """
+        occupied = self.__occupied__
+        if move == self.NOT_MOVED:
+            return self.width * self.height - bin(occupied).count("1")
+
+        count = 0
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            for cell, bit in ray:
+                if occupied & bit:
+                    break
+                count += 1
+        return count
+
+    def __has_moves__(self, move):
+        """
+        Whether a player has any legal move. Only the first space of each ray has to be checked.
+        Parameters:
+            move: (int, int), Last move made by player in question (where they currently are).
+            Takes the form of (column, row).
+        Returns:
+           bool: Same as bool(self.__get_moves__(move))
+        """
+        occupied = self.__occupied__
+        if move == self.NOT_MOVED:
+            return occupied != (1 << (self.width * self.height)) - 1
+
+        for ray in self.__rays__[move[0] * self.width + move[1]]:
+            if not occupied & ray[0][1]:
+                return True
+        return False
+
+    def get_first_moves(self):
+        """
+        Return all moves for first turn in game (i.e. every board position)
+        Parameters:
+            None
+        Returns:
+           [(int, int)]: List of all legal moves. Each move takes the form of
+            (column, row).
+        """
+        # copy the list of all spaces and take out the occupied ones, highest index first so the
+        # lower indices stay in place; only few spaces are occupied while a queen is not placed yet
+        moves = list(_board_cells(self.width, self.height))
+        occupied = self.__occupied__
+        while occupied:
+            index = occupied.bit_length() - 1
+            del moves[index]
+            occupied ^= 1 << index
+        return moves
+
+    def __neighbours__(self, mask):
+        """
+        Spaces of mask and every space horizontally, vertically or diagonally adjacent to one of them.
+        """
+        not_first_row, not_last_row, spaces = _neighbour_masks(self.width, self.height)
+        rows = mask | (mask << 1) & not_first_row | (mask >> 1) & not_last_row
+        return (rows | rows << self.width | rows >> self.width) & spaces
+
+    def get_region_mask(self, position):
+        """
+        Get the region of a queen (see get_region) as a bitmask. The flood fill grows the whole region
+        by one step of neighbours per round with a few shifts, instead of visiting it space by space.
+        Parameters:
+            position: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+            int: Bitmask of the reachable blank spaces
+        """
+        blank = ~self.__occupied__ & _neighbour_masks(self.width, self.height)[2]
+        if position == Board.NOT_MOVED:
+            return blank
+        region = 0
+        grown = self.__neighbours__(1 << (position[0] * self.width + position[1])) & blank
+        while grown != region:
+            region = grown
+            grown = self.__neighbours__(region) & blank
+        return region
+
+    def get_region(self, position):
+        """
+        Get the blank spaces a queen on position could ever reach, see Board.get_region.
+        Parameters:
+            position: (int, int), Queen position. Takes the form of (column, row).
+        Returns:
+            set((int, int)): Reachable blank spaces; every blank space for a queen that has not moved
+        """
+        w = self.width
+        mask = self.get_region_mask(position)
+        region = set()
+        while mask:
+            index = mask.bit_length() - 1
+            region.add((index // w, index % w))
+            mask ^= 1 << index
+        return region
+
+    def is_partitioned(self):
+        """
+        Check whether the two queens are walled off from each other, see Board.is_partitioned. Regions
+        are unions of areas of connected blank spaces, so they overlap exactly when the region of queen
+        1 reaches a blank neighbour of queen 2; the flood fill stops as soon as it does.
+        Parameters:
+            None
+        Returns:
+            bool: Whether both queens are on the board and their regions are disjoint
+        """
+        position_1 = self.__last_queen_move__[self.__queen_1__]
+        position_2 = self.__last_queen_move__[self.__queen_2__]
+        if position_1 == Board.NOT_MOVED or position_2 == Board.NOT_MOVED:
+            return False
+        w = self.width
+        blank = ~self.__occupied__ & _neighbour_masks(w, self.height)[2]
+        target = self.__neighbours__(1 << (position_2[0] * w + position_2[1])) & blank
+        region = 0
+        grown = self.__neighbours__(1 << (position_1[0] * w + position_1[1])) & blank
+        while grown != region:
+            if grown & target:
+                return False
+            region = grown
+            grown = self.__neighbours__(region) & blank
+        return True
+
+    def get_occupancy_mask(self):
+        """
+        Get the spaces that are not blank as a bitmask, bit (column * width + row) for space (column, row).
+        Parameters:
+            None
+        Returns:
+            int: Occupancy bitmask
+        """
+        return self.__occupied__
+
+    def is_spot_open(self, col, row):
+        """
+        Sanity check for making sure a move isn't occupied by an X.
+        Parameters:
+            col: int, Column position of move in question
+            row: int, Row position of move in question
+        Returns:
+            bool: Whether the [col, row] position is blank (no X)
+        """
+        return not self.__occupied__ >> (col * self.width + row) & 1
+
+    def is_spot_queen(self, col, row):
+        """
+        Sanity check for checking if a spot is occupied by a player
+        Parameters:
+            col: int, Column position of move in question
+            row: int, Row position of move in question
+        Returns:
+            bool: Whether the [col, row] position is currently occupied by a player's queen
+        """
+        return (col, row) == self.__last_queen_move__[self.__active_players_queen__] or \
+               (col, row) == self.__last_queen_move__[self.__inactive_players_queen__]
+
+    def space_is_open(self, col, row):
+        """
+        Sanity check to see if a space is within the bounds of the board and blank. Not meant to be called directly if you don't know what
+        you're looking for.
+        Parameters:
+            col: int, Col value of desired space
+            row: int, Row value of desired space
+        Returns:
+            bool: (Col, Row ranges are valid) AND (space is blank)
+        """
+        return 0 <= col < self.height and \
+               0 <= row < self.width and \
+               self.is_spot_open(row, col)
+
+    def __apply_move_write__(self, move_queen):
+        """
+        Equivalent to __apply_move__, meant specifically for applying move history to a board
+        for analyzing an already played game.
+        Parameters:
+            move_queen: (int, int), Move to apply to board. Takes
+            the form of (column, row).
+        Returns:
+            None
+        """
+
+        if move_queen[0] is None or move_queen[1] is None:
+            return
+
+        col, row = move_queen
+        my_pos = self.__last_queen_move__[self.__active_players_queen__]
+
+        self.__last_queen_move__[self.__active_players_queen__] = move_queen
+        self.__occupied__ |= 1 << (col * self.width + row)
+
+        if self.move_is_in_board(my_pos[0], my_pos[1]):
+            self.__blocked__ |= 1 << (my_pos[0] * self.width + my_pos[1])
+
+        self.__active_player__, self.__inactive_player__ = self.__inactive_player__, self.__active_player__
+        self.__active_players_queen__, self.__inactive_players_queen__ = self.__inactive_players_queen__, self.__active_players_queen__
+
+        self.move_count = self.move_count + 1
+        self.__zobrist__ = self.__compute_zobrist__()
+        self.__reset_mobility__()
+        self.__reset_symmetries__()
+
+
+# Layout of Board.to_bytes before the occupancy bitmask (little endian): width, height, space index
+# (col * width + row) of queen 1 and queen 2 (PACKED_NOT_MOVED before the queen's first move), side to
+# move (1 or 2) and move count
+PACKED_HEADER = struct.Struct("<HHHHBH")
+PACKED_NOT_MOVED = 65535
+
+
+class Deadline:
+    """
+    Move clock that play_isolation hands to players as time_left. Calling it returns the milliseconds
+    left, like the time_left functions it replaces; expired() is the cheap check for search loops: it only
+    reads the clock every check_every calls and, once it returned True, keeps returning True without
+    reading it. The clock is monotonic wall time (time.perf_counter), which never runs slower than the
+    process CPU time play_isolation judges timeouts by, so a player that stops on it is never late.
+    """
+
+    def __init__(self, milliseconds, margin=100, check_every=64):
+        """
+        Parameters:
+            milliseconds: float, Time left from now
+            margin: float, Milliseconds before the end at which expired() turns True; the default is the
+            100 ms alphabeta keeps for unwinding
+            check_every: int, Calls of expired() per clock read
+        """
+        self.end = time.perf_counter() + milliseconds / 1000.0
+        self.margin = margin
+        self.check_every = check_every
+        self.__countdown__ = 0
+        self.__expired__ = False
+
+    def __call__(self):
+        """
+        Returns:
+            float: Milliseconds left
+        """
+        return 1000 * (self.end - time.perf_counter())
+
+    def expired(self):
+        """
+        Amortised check whether less than margin milliseconds are left. May answer False for up to
+        check_every - 1 calls after the time actually ran out.
+        Returns:
+            bool: True once the time is up
+        """
+        if self.__countdown__:
+            self.__countdown__ -= 1
+            return False
+        if self.__expired__ or 1000 * (self.end - time.perf_counter()) < self.margin:
+            self.__expired__ = True
+            return True
+        self.__countdown__ = self.check_every - 1
+        return False
+
+
+class MoveProfiler:
+    """
+    Opt-in per-move resource profile of a game, filled in by play_isolation(profiler=...). For every move
+    it records the player's wall time, the CPU time play_isolation judges timeouts by, the peak resident
+    set size (ru_maxrss) and, with allocations, what tracemalloc saw during the move: the peak of extra
+    memory, and the blocks and bytes still allocated when the move returned. With functions, each
+    player's moves run under cProfile. report() sums it all up per player and per game phase, with
+    histograms. Tracing allocations and profiling functions both slow the players down, so their times
+    are only comparable to other profiled runs.
+    """
+
+    # Game phases by the share of blank spaces at the start of the move, first match wins
+    PHASES = (("opening", 2.0 / 3), ("middlegame", 1.0 / 3), ("endgame", 0.0))
+
+    def __init__(self, allocations=True, functions=False, top=15, bins=10):
+        """
+        Parameters:
+            allocations: bool, Trace allocations with tracemalloc; it is started for the game if it is
+            not tracing already
+            functions: bool, Profile the players' functions with cProfile (the thread calling move only)
+            top: int, Allocation sites and functions listed per player
+            bins: int, Bins per histogram
+        """
+        self.allocations = allocations
+        self.functions = functions
+        self.top = top
+        self.bins = bins
+        self.moves = []
+        self.result = None
+        self.__profiles__ = {}
+        self.__sites__ = {}
+        self.__tracing__ = False
+        self.__move__ = None
+
+    def start_move(self, board):
+        """Start measuring the move of board's active player; called before the player's clock starts."""
+        queen = board.__active_players_queen__
+        blank = board.get_open_spaces() / float(board.width * board.height)
+        move = {"move_number": board.move_count,
+                "queen": queen,
+                "phase": next(name for name, share in MoveProfiler.PHASES if blank >= share),
+                "open_spaces": board.get_open_spaces(),
+                "rss_before": _max_rss_kb()}
+        if self.allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.__tracing__ = True
+            move["snapshot"] = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            move["traced_before"] = tracemalloc.get_traced_memory()[0]
+        if self.functions:
+            profile = self.__profiles__.get(queen)
+            if profile is None:
+                profile = self.__profiles__[queen] = cProfile.Profile()
+            move["profile"] = profile
+            profile.enable()
+        self.__move__ = move
+        move["wall_start"] = time.perf_counter()
+
+    def end_move(self, board, curr_move, cpu_ms):
+        """
+        Finish the measurement started by start_move.
+        Parameters:
+            board: Board, The board before the move is applied
+            curr_move: (int, int), The move the player returned
+            cpu_ms: float, Time play_isolation charged the player (CPU time, wall time on Windows)
+        """
+        wall_ms = 1000 * (time.perf_counter() - self.__move__["wall_start"])
+        move = self.__move__
+        self.__move__ = None
+        if "profile" in move:
+            move.pop("profile").disable()
+        rss = _max_rss_kb()
+        record = {"move_number": move["move_number"],
+                  "queen": move["queen"],
+                  "move": curr_move,
+                  "phase": move["phase"],
+                  "open_spaces": move["open_spaces"],
+                  "depth": getattr(board.__active_player__, "depth_reached", None),
+                  "wall_ms": wall_ms,
+                  "cpu_ms": cpu_ms,
+                  "maxrss_kb": rss,
+                  "rss_growth_kb": rss - move["rss_before"] if rss is not None else None}
+        if "snapshot" in move:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            sites = self.__sites__.setdefault(move["queen"], {})
+            blocks = 0
+            for stat in snapshot.filter_traces(_UNTRACED).compare_to(
+                    move["snapshot"].filter_traces(_UNTRACED), "lineno"):
+                if stat.count_diff > 0:
+                    blocks += stat.count_diff
+                    frame = stat.traceback[0]
+                    site = sites.setdefault("%s:%d" % (frame.filename, frame.lineno), [0, 0])
+                    site[0] += stat.count_diff
+                    site[1] += stat.size_diff
+            record["alloc_peak_kb"] = (peak - move["traced_before"]) / 1024.0
+            record["alloc_net_kb"] = (current - move["traced_before"]) / 1024.0
+            record["alloc_blocks"] = blocks
+        self.moves.append(record)
+
+    def finish(self, result=None):
+        """
+        End of the game: stop tracemalloc if this profiler started it.
+        Parameters:
+            result: (str, list, str), What play_isolation returned, None if it raised
+        """
+        if self.__move__ is not None and "profile" in self.__move__:
+            self.__move__["profile"].disable()
+        self.__move__ = None
+        if self.__tracing__:
+            tracemalloc.stop()
+            self.__tracing__ = False
+        self.result = result
+
+    def report(self):
+        """
+        Returns:
+            dict: winner, termination, the per-move records and per player: move count, wall and CPU
+            time totals, means and maxima, the same per phase, histograms of the times and allocations,
+            the largest ru_maxrss, and the top allocation sites and functions (by own time) if they were
+            measured
+        """
+        players = {}
+        for queen in sorted(set(move["queen"] for move in self.moves)):
+            moves = [move for move in self.moves if move["queen"] == queen]
+            player = {"moves": len(moves),
+                      "wall_ms": _summary([move["wall_ms"] for move in moves]),
+                      "cpu_ms": _summary([move["cpu_ms"] for move in moves]),
+                      "maxrss_kb": max(move["maxrss_kb"] for move in moves) if moves[0]["maxrss_kb"] is not None
+                      else None,
+                      "phases": {},
+                      "histograms": {}}
+            for phase, share in MoveProfiler.PHASES:
+                in_phase = [move for move in moves if move["phase"] == phase]
+                if in_phase:
+                    player["phases"][phase] = {"moves": len(in_phase),
+                                               "wall_ms": _summary([move["wall_ms"] for move in in_phase]),
+                                               "cpu_ms": _summary([move["cpu_ms"] for move in in_phase])}
+            keys = ["wall_ms", "cpu_ms"] + (["alloc_peak_kb", "alloc_blocks"] if "alloc_blocks" in moves[0] else [])
+            for key in keys:
+                player["histograms"][key] = _histogram([move[key] for move in moves], self.bins)
+            if queen in self.__sites__:
+                sites = sorted(self.__sites__[queen].items(), key=lambda item: -item[1][1])[:self.top]
+                player["allocation_sites"] = [{"site": site, "blocks": blocks, "kb": size / 1024.0}
+                                              for site, (blocks, size) in sites]
+            if queen in self.__profiles__:
+                stats = pstats.Stats(self.__profiles__[queen]).stats
+                hot = sorted(stats.items(), key=lambda item: -item[1][2])[:self.top]
+                player["functions"] = [{"function": "%s:%d(%s)" % key,
+                                        "calls": calls,
+                                        "own_ms": 1000 * own,
+                                        "cumulative_ms": 1000 * cumulative}
+                                       for key, (primitive, calls, own, cumulative, callers) in hot]
+            players[queen] = player
+        return {"winner": self.result[0] if self.result else None,
+                "termination": self.result[2] if self.result else None,
+                "players": players,
+                "moves": self.moves}
+
+
+# tracemalloc's own bookkeeping is not the players' doing
+_UNTRACED = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def _max_rss_kb():
+    """Peak resident set size of the process in kilobytes, None where resource is not available."""
+    if platform.system() == 'Windows':
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss // 1024 if platform.system() == 'Darwin' else rss
+
+
+def _summary(values):
+    """Total, mean and maximum of a non-empty list."""
+    return {"total": sum(values), "mean": sum(values) / len(values), "max": max(values)}
+
+
+def _histogram(values, bins):
+    """
+    Equal-width histogram of values, from the smallest to the largest.
+    Returns:
+        [dict]: from, to and count per bin; the last bin includes its upper edge
+    """
+    low, high = min(values), max(values)
+    width = (high - low) / float(bins) if high > low else 1.0
+    counts = [0] * bins
+    for value in values:
+        counts[min(int((value - low) / width), bins - 1)] += 1
+    return [{"from": low + i * width, "to": low + (i + 1) * width, "count": count} for i, count in enumerate(counts)]
+
+
+_RAY_TABLES = {}
+
+
+def _ray_table(width, height):
+    """
+    Per board size table of queen rays: entry (col * width + row) holds, for each of the 8 directions in
+    Board.DIRECTIONS order, the ordered ((col, row), bit) pairs a queen on (col, row) slides over before
+    leaving the board. Empty rays are left out. Built once per size.
+    """
+    table = _RAY_TABLES.get((width, height))
+    if table is None:
+        table = []
+        for col in range(0, height):
+            for row in range(0, width):
+                rays = []
+                for dc, dr in Board.DIRECTIONS:
+                    ray = []
+                    c, r = col + dc, row + dr
+                    while 0 <= c < height and 0 <= r < width:
+                        ray.append(((c, r), 1 << (c * width + r)))
+                        c, r = c + dc, r + dr
+                    if ray:
+                        rays.append(tuple(ray))
+                table.append(tuple(rays))
+        table = _RAY_TABLES[(width, height)] = tuple(table)
+    return table
+
+
+_RAY_ALIGNMENTS = {}
+
+
+def _ray_alignment(width, height):
+    """
+    Per board size inverse of the ray table: entry (col * width + row) maps the index of every space a
+    queen on (col, row) could slide to onto (ray, step), its position in that queen's row of _ray_table.
+    Built once per size.
+    """
+    table = _RAY_ALIGNMENTS.get((width, height))
+    if table is None:
+        table = []
+        for rays in _ray_table(width, height):
+            aligned = {}
+            for ray, cells in enumerate(rays):
+                for step, ((col, row), bit) in enumerate(cells):
+                    aligned[col * width + row] = (ray, step)
+            table.append(aligned)
+        table = _RAY_ALIGNMENTS[(width, height)] = tuple(table)
+    return table
+
+
+_RAY_MASKS = {}
+
+
+def _ray_masks(width, height):
+    """
+    Per board size bitmask version of the ray table: entry (col * width + row) holds, per ray in
+    _ray_table order, (mask of the ray's spaces, whether it runs towards higher indices, number of spaces,
+    steps) where steps[bit_length] is the number of spaces before the space with that bit. Built once per
+    size.
+    """
+    table = _RAY_MASKS.get((width, height))
+    if table is None:
+        table = []
+        for index, rays in enumerate(_ray_table(width, height)):
+            entry = []
+            for cells in rays:
+                mask = 0
+                steps = {}
+                for step, (cell, bit) in enumerate(cells):
+                    mask |= bit
+                    steps[bit.bit_length()] = step
+                entry.append((mask, cells[0][1] > 1 << index, len(cells), steps))
+            table.append(tuple(entry))
+        table = _RAY_MASKS[(width, height)] = tuple(table)
+    return table
+
+
+_BOARD_CELLS = {}
+
+
+def _board_cells(width, height):
+    """
+    Per board size tuple of every space (col, row), in index order (col * width + row). Built once per
+    size.
+    """
+    cells = _BOARD_CELLS.get((width, height))
+    if cells is None:
+        cells = _BOARD_CELLS[(width, height)] = tuple((col, row) for col in range(0, height)
+                                                      for row in range(0, width))
+    return cells
+
+
+_NEIGHBOUR_MASKS = {}
+
+
+def _neighbour_masks(width, height):
+    """
+    Per board size masks for growing a bitmask by its neighbours with shifts: (every space but those of
+    row 0, every space but those of row width - 1, every space). Shifting by one changes the row, and the
+    first two masks drop the bits that wrapped into the next or previous column. Built once per size.
+    """
+    masks = _NEIGHBOUR_MASKS.get((width, height))
+    if masks is None:
+        spaces = (1 << (width * height)) - 1
+        first_row = last_row = 0
+        for col in range(0, height):
+            first_row |= 1 << (col * width)
+            last_row |= 1 << (col * width + width - 1)
+        masks = _NEIGHBOUR_MASKS[(width, height)] = (spaces & ~first_row, spaces & ~last_row, spaces)
+    return masks
+
+
+_SYMMETRIES = {}
+
+
+def _symmetries(width, height):
+    """
+    Per board size table of board symmetries as space permutations: entry i maps the index
+    (col * width + row) of every space onto its index after symmetry i. The identity comes first, then
+    the mirror images and, for square boards, the rotations and diagonal reflections. Built once per size.
+    """
+    table = _SYMMETRIES.get((width, height))
+    if table is None:
+        maps = [lambda col, row: (col, row),
+                lambda col, row: (col, width - 1 - row),
+                lambda col, row: (height - 1 - col, row),
+                lambda col, row: (height - 1 - col, width - 1 - row)]
+        if width == height:
+            maps += [lambda col, row: (row, col),
+                     lambda col, row: (row, height - 1 - col),
+                     lambda col, row: (width - 1 - row, col),
+                     lambda col, row: (width - 1 - row, height - 1 - col)]
+        table = []
+        for transform in maps:
+            permutation = []
+            for col in range(0, height):
+                for row in range(0, width):
+                    new_col, new_row = transform(col, row)
+                    permutation.append(new_col * width + new_row)
+            table.append(tuple(permutation))
+        table = _SYMMETRIES[(width, height)] = tuple(table)
+    return table
+
+
+_ZOBRIST_KEYS = {}
+
+
+def _zobrist_keys(width, height):
+    """
+    Per board size Zobrist keys: (blocked keys, queen 1 keys, queen 2 keys, side to move key), the first
+    three indexed by (col * width + row). The generator is seeded from the board size so hashes are the
+    same in every process, which lets them be stored on disk.
+    """
+    keys = _ZOBRIST_KEYS.get((width, height))
+    if keys is None:
+        rng = random.Random("zobrist %dx%d" % (width, height))
+        cells = width * height
+        keys = _ZOBRIST_KEYS[(width, height)] = (tuple(rng.getrandbits(64) for i in range(cells)),
+                                                 tuple(rng.getrandbits(64) for i in range(cells)),
+                                                 tuple(rng.getrandbits(64) for i in range(cells)),
+                                                 rng.getrandbits(64))
+    return keys
+
+
+_CRATER_MASKS = {}
+
+
+def _crater_masks(width, height):
+    """
+    Per board size table of impact crater masks: entry (col * width + row) has the bits of the
+    (up to) 4 spaces vertically and horizontally adjacent to (col, row). Built once per size.
+    """
+    masks = _CRATER_MASKS.get((width, height))
+    if masks is None:
+        masks = []
+        for col in range(0, height):
+            for row in range(0, width):
+                mask = 0
+                for adj_col, adj_row in ((col - 1, row), (col, row - 1), (col, row + 1), (col + 1, row)):
+                    if 0 <= adj_col < height and 0 <= adj_row < width:
+                        mask |= 1 << (adj_col * width + adj_row)
+                masks.append(mask)
+        masks = _CRATER_MASKS[(width, height)] = tuple(masks)
+    return masks
+
+
+_RAY_INDEX = {}
+
+
+def _ray_index(width, height):
+    """
+    Per board size numpy version of the ray table for batch_mobility: entry [index, direction, step]
+    is the space index (col * width + row) of the step-th space of that ray, padded with width * height,
+    which occupancy_array always marks occupied. Row width * height is all padding. Built once per size.
+    """
+    table = _RAY_INDEX.get((width, height))
+    if table is None:
+        size = width * height
+        table = np.full((size + 1, len(Board.DIRECTIONS), max(width, height) - 1), size, dtype=np.intp)
+        for index, rays in enumerate(_ray_table(width, height)):
+            for direction, ray in enumerate(rays):
+                for step, ((col, row), bit) in enumerate(ray):
+                    table[index, direction, step] = col * width + row
+        table = _RAY_INDEX[(width, height)] = table
+    return table
+
+
+def occupancy_array(masks, width, height):
+    """
+    Stack occupancy bitmasks (see Board.get_occupancy_mask) into a numpy array.
+    Parameters:
+        masks: [int], Occupancy bitmasks
+        width: int, Board width
+        height: int, Board height
+    Returns:
+        numpy.ndarray: bool array of shape (len(masks), width * height + 1); the extra last column is
+        always True and is where the rays of batch_mobility end
+    """
+    size = width * height
+    size_bytes = size // 8 + 1
+    padding = 1 << size
+    data = b"".join((mask | padding).to_bytes(size_bytes, "little") for mask in masks)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(len(masks), size_bytes),
+                         axis=1, count=size + 1, bitorder="little")
+    return bits.view(bool)
+
+
+def batch_mobility(occupancy, positions, width, height):
+    """
+    Count the legal moves of one queen per board, for a whole stack of boards at once: gather every
+    ray of each queen from the occupancy array and count the blank spaces before the first occupied one.
+    Parameters:
+        occupancy: numpy.ndarray, Boards from occupancy_array
+        positions: [(int, int)], Queen position on each board, Board.NOT_MOVED for a queen that has
+        not moved yet
+        width: int, Board width
+        height: int, Board height
+    Returns:
+        numpy.ndarray: Number of legal moves on each board
+    """
+    size = width * height
+    indices = np.array([size if position == Board.NOT_MOVED else position[0] * width + position[1]
+                        for position in positions], dtype=np.intp)
+    rays = _ray_index(width, height)[indices]
+    blank = ~occupancy[np.arange(len(indices))[:, None, None], rays]
+    counts = np.logical_and.accumulate(blank, axis=2).sum(axis=(1, 2))
+    not_moved = indices == size
+    if not_moved.any():
+        # a queen that has not moved can go to any blank space
+        counts[not_moved] = size - occupancy[not_moved, :size].sum(axis=1)
+    return counts
 
 
 def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
@@ -642,7 +2403,7 @@ def game_as_text(winner, move_history, termination="", board=Board(1, 2)):
             ans.write("\n\n" + board.__queen_1__ + " moves to (" + str(move[0][0]) + "," + str(move[0][1]) + ")\r\n")
 
             
-        if len(move) > 1 and move[1] != Board.NOT_MOVED and move[0] is not None:
+        if len(move) > 1 and move[1] != Board.NOT_MOVED and move[1] is not None:
             ans.write(board.print_board())
             board.__apply_move_write__(move[1])
             ans.write("\n\n" + board.__queen_2__ + " moves to (" + str(move[1][0]) + "," + str(move[1][1]) + ")\r\n")
@@ -0,0 +1,575 @@
+"""
+Serve games of isolation against one engine player to any number of clients at once, over a local socket
+speaking JSON lines:
+
+    python match_server.py serve --player submission:CustomPlayer --player-kwargs '{"iterative": true}' \
+        --port 8765 --workers 4
+    python match_server.py client --port 8765 --games 500 --concurrency 200 --time-limit 1000
+
+The server runs on one asyncio event loop that only keeps the boards and checks moves; every engine
+move is computed in a process pool of --workers processes, each holding one engine player made by the
+factory. The pool is never handed more moves than it has workers (the rest wait on the loop, which
+counts as their latency), so a move starts searching as soon as it is submitted and its time limit
+means what it says. The board travels to the worker packed (Board.to_bytes), and the move comes back
+with the time the search took.
+
+Each game has its own time limit, enforced on both sides as in play_isolation: an engine move that
+took longer than the limit, or never came back within the limit plus TIMEOUT_GRACE, loses the game
+for the server; a client move that arrives later than the limit after the server's reply was sent
+loses it for the client. An illegal move loses too, and so does an engine whose search fails. A
+connection can only move in and resign its own games.
+
+Protocol: every request and every response is one JSON object on one line. A request may carry a
+"ref" of the client's choosing, which its response repeats, so many games can share a connection and
+responses may arrive in any order.
+    {"op": "new", "side": 1, "width": 9, "height": 9, "time_limit": 1000}
+        Start a game with the client as queen 1 (the default) or 2. Response: {"game": id, "side",
+        "move", "over", "winner", "reason"}, where move is the server's first move if it is queen 1,
+        else null.
+    {"op": "move", "game": id, "move": [col, row]}
+        Play the client's move. Response: {"game", "move", "over", "winner", "reason"} with the
+        server's reply move (null once the game is over), winner "client" or "server" when it is.
+    {"op": "resign", "game": id}
+    {"op": "stats"}
+        Response: games in play and finished, moves served, timeouts, and percentiles of the latency
+        (request received to reply sent) and search time of the engine moves, in milliseconds.
+A request the server cannot serve gets {"error": reason}. Games of a connection end when it closes.
+
+The client subcommand is a local stand-in for real clients: it plays random legal moves in many
+concurrent games over one connection and prints the round trip percentiles it saw next to the
+server's own stats.
+"""
+from argparse import ArgumentParser
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+
+from isolation import Board, Deadline
+from tournament import load_factory
+
+
+PERCENTILES = (50, 90, 99)
+# Latencies kept for the stats, oldest dropped first
+LATENCY_SAMPLES = 100000
+# Seconds past its time limit an engine move may take to come back before the game is given up
+TIMEOUT_GRACE = 0.5
+MAX_TIME_LIMIT = 600000
+
+
+class Client:
+    """Stand-in for the client's side of a board."""
+
+
+class Server:
+    """Stand-in for the engine's side of a board on the event loop."""
+
+
+def percentiles(samples, points=PERCENTILES):
+    """
+    Nearest-rank percentiles of samples.
+    Parameters:
+        samples: iterable of float
+        points: [int], Percentiles to report
+    Returns:
+        dict: "p50" etc. and "max", None each if there are no samples
+    """
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        result["p%d" % point] = ordered[max(0, -(-point * len(ordered) // 100) - 1)] if ordered else None
+    result["max"] = ordered[-1] if ordered else None
+    return result
+
+
+_engine = None
+
+
+def _init_worker(factory):
+    global _engine
+    # Ctrl-C reaches the whole process group; the server shuts the workers down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _engine = factory()
+
+
+def _ready():
+    return os.getpid()
+
+
+def search_move(data, side, time_limit, engine="bitboard"):
+    """
+    Compute the engine's move for a packed position. Runs in a worker process set up by _init_worker,
+    which reuses the worker's player from one move to the next.
+    Parameters:
+        data: bytes, Position packed by Board.to_bytes
+        side: int, Queen of the engine, 1 or 2
+        time_limit: int, Milliseconds for the move
+        engine: str, Board engine
+    Returns:
+        ((int, int), float): The move and the milliseconds the search took
+    """
+    opponent = Client()
+    players = (_engine, opponent) if side == 1 else (opponent, _engine)
+    board = Board.from_bytes(data, players[0], players[1], engine)
+    start = time.perf_counter()
+    try:
+        move = _engine.move(board, Deadline(time_limit))
+    finally:
+        # the worker's next move is most likely in another game, so nothing is worth pondering
+        board.end_game()
+    return tuple(move), 1000.0 * (time.perf_counter() - start)
+
+
+class _Game:
+    """A game in play on the server."""
+
+    def __init__(self, game_id, side, width, height, time_limit, engine):
+        self.id = game_id
+        self.side = side
+        self.time_limit = time_limit
+        self.board = Board(Client(), Server(), width, height, engine=engine) if side == 1 else \
+            Board(Server(), Client(), width, height, engine=engine)
+        self.busy = False
+        self.over = False
+        # "client" or "server" and the reason once the game is over
+        self.winner = None
+        self.reason = None
+        # perf_counter of the last reply, when the client's clock started
+        self.replied = None
+
+    @property
+    def client_queen(self):
+        return self.board.__queen_1__ if self.side == 1 else self.board.__queen_2__
+
+    @property
+    def server_queen(self):
+        return self.board.__queen_2__ if self.side == 1 else self.board.__queen_1__
+
+
+class MatchServer:
+    """Serves games against the engine player over asyncio streams.
+
+    The event loop never searches: it keeps the boards, judges moves and
+    times, and hands the engine moves to a process pool bounded by a
+    semaphore of one slot per worker.
+    """
+
+    def __init__(self, factory, workers=None, max_games=1000, engine="bitboard"):
+        """
+        Args:
+            factory (callable): Returns a new engine player; must be picklable
+            workers (int): Worker processes, defaults to the number of CPUs
+            max_games (int): Games in play at most, new ones are refused beyond that
+            engine (str): Board engine of the games
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_games = max_games
+        self.engine = engine
+        # spawned, not forked: a forked worker would keep copies of the client sockets open
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker, initargs=(factory,))
+        self.games = {}
+        self.games_finished = 0
+        self.moves = 0
+        self.timeouts = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.search_times = deque(maxlen=LATENCY_SAMPLES)
+        self.__ids__ = itertools.count(1)
+        self.__free_workers__ = None
+        self.__server__ = None
+        # writer: handler task of every open connection
+        self.__connections__ = {}
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        """
+        Start the workers, then listen on a Unix socket at path if it is given, else on host and port.
+        Returns:
+            asyncio.Server
+        """
+        self.__free_workers__ = asyncio.Semaphore(self.workers)
+        # the first moves should not wait for worker processes to start and build their players
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, _ready) for i in range(self.workers)])
+        if path is not None:
+            self.__server__ = await asyncio.start_unix_server(self.__handle_connection__, path)
+        else:
+            self.__server__ = await asyncio.start_server(self.__handle_connection__, host, port)
+        return self.__server__
+
+    async def close(self):
+        """Stop listening, close the connections and shut the pool down."""
+        if self.__server__ is not None:
+            self.__server__.close()
+            handlers = list(self.__connections__.values())
+            for writer in list(self.__connections__):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self.__server__.wait_closed()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Games, moves, timeouts and latency and search time percentiles in milliseconds
+        """
+        return {"games": len(self.games),
+                "games_finished": self.games_finished,
+                "moves": self.moves,
+                "timeouts": self.timeouts,
+                "workers": self.workers,
+                "latency_ms": percentiles(self.latencies),
+                "search_ms": percentiles(self.search_times)}
+
+    async def __handle_connection__(self, reader, writer):
+        owned = set()
+        tasks = set()
+        self.__connections__[writer] = asyncio.current_task()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received = time.perf_counter()
+                # requests of one connection run side by side, so a slow game does not hold up the others
+                task = asyncio.ensure_future(self.__respond__(line, received, owned, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            for game_id in owned:
+                if self.games.pop(game_id, None) is not None:
+                    self.games_finished += 1
+            self.__connections__.pop(writer, None)
+            writer.close()
+
+    async def __respond__(self, line, received, owned, writer):
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                request = {}
+                raise ValueError("request is not a JSON object")
+            response = await self.handle(request, received, owned)
+        except Exception as e:
+            # every request gets an answer, whatever went wrong
+            response = {"error": str(e) or type(e).__name__}
+        if "ref" in request:
+            response["ref"] = request["ref"]
+        try:
+            writer.write((json.dumps(response) + "\n").encode("utf-8"))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle(self, request, received=None, owned=None):
+        """
+        Serve one protocol request.
+        Args:
+            request (dict): The parsed request
+            received (float): perf_counter when it arrived, for the client's clock and the latency
+            owned (set): Game ids of the connection, updated by new games; moves and resignations of
+                other games are refused. None for a caller that may play every game.
+        Returns:
+            dict: The response
+        """
+        received = time.perf_counter() if received is None else received
+        op = request.get("op")
+        if op == "new":
+            return await self.__new_game__(request, received, owned)
+        if op == "stats":
+            return self.stats()
+        if op not in ("move", "resign"):
+            return {"error": "unknown op %r" % (op,)}
+
+        game = self.games.get(request.get("game"))
+        if game is None or (owned is not None and game.id not in owned):
+            return {"error": "no game %r in play" % (request.get("game"),)}
+        if op == "resign":
+            return self.__finish__(game, "server", game.client_queen + " resigned.")
+        if game.busy:
+            return {"game": game.id, "error": "not the client's turn"}
+
+        board = game.board
+        if game.time_limit and 1000.0 * (received - game.replied) > game.time_limit:
+            return self.__finish__(game, "server", board.__active_players_queen__ + " timed out.")
+        move = request.get("move")
+        move = tuple(move) if isinstance(move, list) else move
+        if move not in board.get_active_moves():
+            return self.__finish__(game, "server", board.__active_players_queen__ + " made an illegal move.")
+        is_over, winner = board.__apply_move__(move)
+        if is_over:
+            return self.__finish__(game, "client", board.__active_players_queen__ + " has no legal moves left.")
+        return await self.__engine_move__(game, received)
+
+    async def __new_game__(self, request, received, owned):
+        if len(self.games) >= self.max_games:
+            return {"error": "server is full (%d games)" % self.max_games}
+        side = request.get("side", 1)
+        width = request.get("width", 9)
+        height = request.get("height", 9)
+        time_limit = request.get("time_limit", 1000)
+        if side not in (1, 2):
+            return {"error": "side must be 1 or 2"}
+        if not (isinstance(width, int) and isinstance(height, int) and 3 <= width <= 255 and 3 <= height <= 255):
+            return {"error": "width and height must be integers from 3 to 255"}
+        if not (isinstance(time_limit, int) and 0 < time_limit <= MAX_TIME_LIMIT):
+            return {"error": "time_limit must be an integer from 1 to %d" % MAX_TIME_LIMIT}
+
+        game = _Game(next(self.__ids__), side, width, height, time_limit, self.engine)
+        self.games[game.id] = game
+        if owned is not None:
+            owned.add(game.id)
+        if side == 1:
+            game.replied = time.perf_counter()
+            response = {"game": game.id, "move": None, "over": False, "winner": None, "reason": None}
+        else:
+            response = await self.__engine_move__(game, received)
+        response["side"] = side
+        return response
+
+    async def __engine_move__(self, game, received):
+        """Get the engine's move for game from the pool, judge and apply it."""
+        board = game.board
+        game.busy = True
+        failure = None
+        try:
+            await self.__free_workers__.acquire()
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(self.executor, search_move, board.to_bytes(), game.side ^ 3,
+                                              game.time_limit, self.engine)
+            except Exception:
+                # a broken pool refuses the move right away
+                self.__free_workers__.release()
+                raise
+            # the slot stays taken until the worker is really done, even if the game gave up on it
+            future.add_done_callback(self.__release_slot__)
+            move, elapsed = await asyncio.wait_for(asyncio.shield(future), game.time_limit / 1000.0 + TIMEOUT_GRACE)
+        except asyncio.TimeoutError:
+            move, elapsed = None, None
+        except Exception as e:
+            # the engine raised or the pool broke; either way the server has no move to play
+            move, elapsed, failure = None, None, e
+        finally:
+            game.busy = False
+        if game.over:
+            # resigned while the engine was thinking
+            return self.__result__(game)
+        if failure is not None:
+            return self.__finish__(game, "client", "%s failed to move (%s)." % (
+                game.server_queen, str(failure) or type(failure).__name__))
+
+        self.moves += 1
+        if elapsed is not None:
+            self.search_times.append(elapsed)
+        if elapsed is None or elapsed > game.time_limit:
+            self.timeouts += 1
+            return self.__finish__(game, "client", board.__active_players_queen__ + " timed out.")
+        if move not in board.get_active_moves():
+            return self.__finish__(game, "client", board.__active_players_queen__ + " made an illegal move.")
+        is_over, winner = board.__apply_move__(move)
+        game.replied = time.perf_counter()
+        self.latencies.append(1000.0 * (game.replied - received))
+        if is_over:
+            response = self.__finish__(game, "server", board.__active_players_queen__ + " has no legal moves left.")
+            response["move"] = list(move)
+            return response
+        return {"game": game.id, "move": list(move), "over": False, "winner": None, "reason": None}
+
+    def __release_slot__(self, future):
+        if not future.cancelled():
+            # mark an exception of a search nobody waits for any more as seen
+            future.exception()
+        self.__free_workers__.release()
+
+    def __finish__(self, game, winner, reason):
+        game.over = True
+        game.winner = winner
+        game.reason = reason
+        if self.games.pop(game.id, None) is not None:
+            self.games_finished += 1
+        return self.__result__(game)
+
+    @staticmethod
+    def __result__(game):
+        return {"game": game.id, "move": None, "over": True, "winner": game.winner, "reason": game.reason}
+
+
+class MatchClient:
+    """Client of a MatchServer; requests of many games share one connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.__refs__ = itertools.count(1)
+        self.__waiting__ = {}
+        self.__reading__ = asyncio.ensure_future(self.__read__())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None):
+        """Open a connection, to the Unix socket at path if it is given."""
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, **request):
+        """
+        Send one request and wait for its response.
+        Returns:
+            dict: The response
+        """
+        ref = next(self.__refs__)
+        request["ref"] = ref
+        future = self.__waiting__[ref] = asyncio.get_running_loop().create_future()
+        self.writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        return await future
+
+    async def __read__(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.__waiting__.pop(response.get("ref"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.__waiting__.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("match server closed the connection"))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.__reading__.cancel()
+
+
+async def play_random_game(client, rng, width=9, height=9, time_limit=1000, latencies=None):
+    """
+    Play one game of random legal moves against the server, alternating sides by chance.
+    Parameters:
+        client: MatchClient
+        rng: random.Random, Source of the moves and the side
+        width, height: int, Board size
+        time_limit: int, Milliseconds per move
+        latencies: list, Round trip milliseconds of the requests are appended here if given
+    Returns:
+        dict: The final response of the server
+    """
+    side = rng.choice((1, 2))
+    board = Board(Client(), Server(), width, height) if side == 1 else Board(Server(), Client(), width, height)
+    start = time.perf_counter()
+    response = await client.request(op="new", side=side, width=width, height=height, time_limit=time_limit)
+    while True:
+        if latencies is not None:
+            latencies.append(1000.0 * (time.perf_counter() - start))
+        if "error" in response:
+            return response
+        if response["move"] is not None:
+            board.__apply_move__(tuple(response["move"]))
+        if response["over"]:
+            return response
+        move = rng.choice(board.get_active_moves())
+        board.__apply_move__(move)
+        start = time.perf_counter()
+        response = await client.request(op="move", game=response["game"], move=list(move))
+
+
+async def run_load(host="127.0.0.1", port=8765, path=None, games=100, concurrency=100, width=9, height=9,
+                   time_limit=1000, seed=0):
+    """
+    Play games of random moves against a server, concurrency of them at a time over one connection.
+    Returns:
+        dict: Results, client side round trip percentiles and the server's stats
+    """
+    client = await MatchClient.connect(host, port, path)
+    rng = random.Random(seed)
+    latencies = []
+    results = {"client": 0, "server": 0, "errors": 0}
+    pending = iter(range(games))
+
+    async def player():
+        for i in pending:
+            response = await play_random_game(client, random.Random(rng.random()), width, height, time_limit,
+                                              latencies)
+            results["errors" if "error" in response else response["winner"]] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[player() for i in range(min(concurrency, games))])
+    seconds = time.perf_counter() - start
+    server_stats = await client.request(op="stats")
+    await client.close()
+    server_stats.pop("ref", None)
+    return {"games": games,
+            "wins": results,
+            "seconds": seconds,
+            "requests": len(latencies),
+            "requests_per_second": len(latencies) / seconds if seconds else None,
+            "round_trip_ms": percentiles(latencies),
+            "server": server_stats}
+
+
+async def serve(factory, host="127.0.0.1", port=8765, path=None, workers=None, max_games=1000,
+                engine="bitboard"):
+    """Run a MatchServer until cancelled, then print its stats."""
+    server = MatchServer(factory, workers, max_games, engine)
+    listening = await server.start(host, port, path)
+    print("serving on %s" % (path or "%s:%d" % (host, port)), file=sys.stderr)
+    try:
+        await listening.serve_forever()
+    finally:
+        await server.close()
+        print(json.dumps(server.stats()))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Serve isolation games against an engine player, or load test a server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "client"):
+        command = commands.add_parser(name)
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", default=None, help="Unix socket path instead of host and port")
+    serve_parser = commands.choices["serve"]
+    serve_parser.add_argument("--player", default="submission:CustomPlayer", help="engine factory as module:attribute")
+    serve_parser.add_argument("--player-kwargs", type=json.loads, default=None,
+                              help="JSON keyword arguments for the engine")
+    serve_parser.add_argument("--workers", type=int, default=None)
+    serve_parser.add_argument("--max-games", type=int, default=1000)
+    serve_parser.add_argument("--engine", choices=Board.ENGINES, default="bitboard")
+    client_parser = commands.choices["client"]
+    client_parser.add_argument("--games", type=int, default=100)
+    client_parser.add_argument("--concurrency", type=int, default=100)
+    client_parser.add_argument("--width", type=int, default=9)
+    client_parser.add_argument("--height", type=int, default=9)
+    client_parser.add_argument("--time-limit", type=int, default=1000)
+    client_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(load_factory(args.player, args.player_kwargs), args.host, args.port, args.unix,
+                              args.workers, args.max_games, args.engine))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(json.dumps(asyncio.run(run_load(args.host, args.port, args.unix, args.games, args.concurrency,
+                                              args.width, args.height, args.time_limit, args.seed))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Monte Carlo tree search player: UCT selection over a tree that is kept from one move to the next, with
+random playouts run on a bare occupancy bitmask instead of a Board.
+
+    python tournament.py mcts:MCTSPlayer submission:CustomPlayer \
+        --b-kwargs '{"iterative": true}' --games 100 --time-limit 1000
+
+The player has the same move(game, time_left) interface as CustomPlayer and sets the same depth_reached
+and search_value attributes (deepest tree node and the win rate of the chosen move), plus playouts and
+playouts_per_second of its last move, so it drops into tournament.py, selfplay.py and the benchmarks.
+
+A playout needs nothing but the occupancy bitmask (Board.get_occupancy_mask) and the two queen positions:
+moves are counted per ray with the bitmask tables of the BitBoard engine (_ray_masks), the chosen one is
+looked up in the ray table and applied by or-ing its bit and impact crater into the mask.
+"""
+import math
+import random
+
+from isolation import Board, _ray_table, _ray_masks, _crater_masks
+from submission import TIME_RESERVE
+
+
+def random_playout(occupied, mover, other, width, height, rng=random):
+    """
+    Play random moves until a side is out of moves.
+    Parameters:
+        occupied: int, Occupancy bitmask (Board.get_occupancy_mask)
+        mover: int, Space index (col * width + row) of the queen to move, -1 if it was not placed yet
+        other: int, Space index of the other queen, -1 if it was not placed yet
+        width, height: int, Board size
+        rng: random.Random, Source of the random moves
+    Returns:
+        bool: True if the side to move at the start wins
+    """
+    ray_cells = _ray_table(width, height)
+    ray_masks = _ray_masks(width, height)
+    craters = _crater_masks(width, height)
+    size = width * height
+    full = (1 << size) - 1
+    rand = rng.random
+    starter = True
+    while True:
+        if mover < 0:
+            # a queen that was not placed yet may go to any blank space
+            if occupied == full:
+                return not starter
+            while True:
+                dest = int(rand() * size)
+                if not occupied >> dest & 1:
+                    break
+            occupied |= 1 << dest
+        else:
+            reaches = []
+            total = 0
+            for mask, forward, length, steps in ray_masks[mover]:
+                blockers = occupied & mask
+                if not blockers:
+                    reach = length
+                elif forward:
+                    reach = steps[(blockers & -blockers).bit_length()]
+                else:
+                    reach = steps[blockers.bit_length()]
+                reaches.append(reach)
+                total += reach
+            if not total:
+                return not starter
+            pick = int(rand() * total)
+            for ray, reach in enumerate(reaches):
+                if pick < reach:
+                    break
+                pick -= reach
+            cell, bit = ray_cells[mover][ray][pick]
+            dest = bit.bit_length() - 1
+            occupied |= bit
+            if pick:
+                # moved more than one space
+                occupied |= craters[dest]
+        mover, other = other, dest
+        starter = not starter
+
+
+class _Node:
+    """Tree node: the position after move, with its results for the side that played move."""
+
+    __slots__ = ("move", "key", "children", "untried", "visits", "wins", "terminal")
+
+    def __init__(self, move, key, terminal=False):
+        self.move = move
+        self.key = key
+        self.children = {}
+        # legal moves without a child yet, filled in the first time the node is expanded
+        self.untried = None
+        self.visits = 0
+        self.wins = 0
+        self.terminal = terminal
+
+
+class MCTSPlayer:
+    """Player that picks the move most visited by Monte Carlo tree search.
+
+    Every iteration walks down the tree by UCT, pushing the moves on the
+    board it was given (no copies), adds one child, finishes the game from
+    there with random_playout and counts the result on the way back up.
+    After the move the subtree of the chosen move is kept; if the position
+    at the next move is one of its children, the search continues from that
+    child with everything it learned about it.
+    """
+
+    def __init__(self, exploration=1.4, reuse_tree=True, reserve=TIME_RESERVE, max_playouts=None, seed=None):
+        """
+        Args:
+            exploration (float): UCT exploration constant
+            reuse_tree (bool): Keep the subtree of the chosen move for the next move
+            reserve (int): Milliseconds of time_left to leave unused
+            max_playouts (int): Stop after this many playouts even with time
+                left, None to stop only on time
+            seed (int): Seed of the playouts, None for a random one
+        """
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.reserve = reserve
+        self.max_playouts = max_playouts
+        self.rng = random.Random(seed)
+        self.depth_reached = 0
+        self.search_value = None
+        self.playouts = 0
+        self.playouts_per_second = None
+        self.reused_visits = 0
+        self.__root__ = None
+
+    def move(self, game, time_left):
+        """Called to determine one move by your agent
+
+        Args:
+            game (Board): The board and game state.
+            time_left (function): Used to determine time left before timeout
+
+        Returns:
+            tuple: (int,int): Your best move
+        """
+        moves = game.get_active_moves()
+        if not moves:
+            return (-1, -1)
+        start = time_left()
+        root = self.__reused_root__(game)
+        self.reused_visits = root.visits
+        self.depth_reached = 0
+        self.playouts = 0
+
+        while self.max_playouts is None or self.playouts < self.max_playouts:
+            # reading the clock costs about as much as a short playout
+            if self.playouts % 16 == 0 and time_left() < self.reserve:
+                break
+            self.__iterate__(root, game)
+            self.playouts += 1
+
+        seconds = (start - time_left()) / 1000.0
+        self.playouts_per_second = self.playouts / seconds if seconds > 0 else None
+
+        if not root.children:
+            best = _Node(moves[0], None)
+        else:
+            best = max(root.children.values(), key=lambda child: child.visits)
+        self.search_value = best.wins / best.visits if best.visits else None
+        self.__root__ = best if self.reuse_tree and not best.terminal else None
+        return best.move
+
+    def __reused_root__(self, game):
+        """The node of the tree kept from the last move that matches game, or a new root."""
+        key = game.get_zobrist_hash()
+        kept = self.__root__
+        self.__root__ = None
+        if kept is not None:
+            child = kept.children.get(game.get_inactive_position())
+            if child is not None and child.key == key:
+                return child
+        return _Node(None, key)
+
+    def __iterate__(self, root, game):
+        """Run one selection, expansion, playout and update from root."""
+        rand = self.rng.random
+        node = root
+        path = [root]
+
+        # selection
+        while not node.terminal and node.untried is not None and not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            exploration = self.exploration
+            best, best_score = None, -1.0
+            for child in node.children.values():
+                score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best, best_score = child, score
+            node = best
+            game.push_move(node.move)
+            path.append(node)
+
+        # expansion
+        if not node.terminal:
+            if node.untried is None:
+                node.untried = game.get_active_moves()
+            if node.untried:
+                move = node.untried.pop(int(rand() * len(node.untried)))
+                is_over, winner = game.push_move(move)
+                child = node.children[move] = _Node(move, game.get_zobrist_hash(), is_over)
+                node = child
+                path.append(node)
+
+        # playout, from the point of view of the side that moved into node
+        if node.terminal:
+            won = True
+        else:
+            queens = [game.get_active_position(), game.get_inactive_position()]
+            mover, other = [-1 if queen == Board.NOT_MOVED else queen[0] * game.width + queen[1]
+                            for queen in queens]
+            won = not random_playout(game.get_occupancy_mask(), mover, other, game.width, game.height, self.rng)
+
+        if len(path) - 1 > self.depth_reached:
+            self.depth_reached = len(path) - 1
+        for node in reversed(path):
+            node.visits += 1
+            if won:
+                node.wins += 1
+            won = not won
+        for i in range(len(path) - 1):
+            game.pop_move()
+
+    def __getstate__(self):
+        """The search tree stays behind when the player is pickled."""
+        state = self.__dict__.copy()
+        state["__root__"] = None
+        return state
@@ -0,0 +1,283 @@
+"""
+Precomputed opening book: the moves a deep search picks in the first few plies, stored in a compact
+binary file and looked up by the position's canonical hash (Board.get_canonical_hash). Symmetric
+positions share one entry, whose move is stored in the canonical orientation, so a square board's book
+holds up to 8 times fewer positions.
+
+Building runs one long search per position, on a process pool:
+
+    python opening_book.py book.bin --plies 2 --time-limit 20000 \
+        --player submission:CustomPlayer --player-kwargs '{"iterative": true}'
+
+Using it, the book file is memory-mapped, so opening it does not read the file and every lookup is a
+binary search touching a handful of pages:
+
+    player = CustomPlayer(opening_book=OpeningBook("book.bin"))
+
+File layout (little endian):
+    header  - magic b"ISOBOOK2", board width and height (uint16 each), number of entries (uint32)
+    entries - sorted by key, 11 bytes each: canonical position hash (uint64), move column and row in
+              the canonical orientation (uint8 each) and the depth of the search that chose the move (uint8)
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import json
+import mmap
+import os
+import struct
+import sys
+
+from isolation import Board, Deadline
+from tournament import load_factory
+
+
+MAGIC = b"ISOBOOK2"
+HEADER = struct.Struct("<8sHHI")
+ENTRY = struct.Struct("<QBBB")
+
+
+class OpeningBook:
+    """Read-only view of a book file built by build_book.
+
+    The book can be handed to CustomPlayer(opening_book=...) and travels to
+    worker processes pickled as just its path.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Book file written by build_book
+        """
+        self.path = path
+        self.__file__ = None
+        self.__map__ = None
+        self.__open__()
+
+    def __open__(self):
+        self.__file__ = open(self.path, "rb")
+        try:
+            self.__map__ = mmap.mmap(self.__file__.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            self.__file__.close()
+            raise ValueError("%s is not an opening book" % self.path)
+        if len(self.__map__) < HEADER.size:
+            self.close()
+            raise ValueError("%s is not an opening book" % self.path)
+        magic, self.width, self.height, self.entries = HEADER.unpack_from(self.__map__, 0)
+        if magic != MAGIC or len(self.__map__) != HEADER.size + self.entries * ENTRY.size:
+            self.close()
+            raise ValueError("%s is not an opening book" % self.path)
+
+    def close(self):
+        """Unmap and close the book file."""
+        if self.__map__ is not None:
+            self.__map__.close()
+            self.__map__ = None
+        if self.__file__ is not None:
+            self.__file__.close()
+            self.__file__ = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.entries
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.__file__ = None
+        self.__map__ = None
+        self.__open__()
+
+    def probe(self, key):
+        """Binary search the entries for a position hash.
+
+        Args:
+            key (int): Canonical position hash
+
+        Returns:
+            ((int, int), int): book move in the canonical orientation and the
+            depth it was searched to, or None if the position is not in the book
+        """
+        data = self.__map__
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, col, row, depth = ENTRY.unpack_from(data, HEADER.size + middle * ENTRY.size)
+            if entry_key < key:
+                low = middle + 1
+            elif entry_key > key:
+                high = middle
+            else:
+                return (col, row), depth
+        return None
+
+    def lookup(self, game):
+        """Book move for the player to move in game.
+
+        Args:
+            game (Board): A board and game state
+
+        Returns:
+            ((int, int), int): book move and the depth it was searched to, or
+            None if the position is not in the book (or the move stored for its
+            hash is not legal here, which only a hash collision can cause)
+        """
+        if game.width != self.width or game.height != self.height:
+            return None
+        key, symmetry = game.get_canonical_hash()
+        found = self.probe(key)
+        if found is None:
+            return None
+        move = game.from_canonical(found[0], symmetry)
+        if move not in game.get_active_moves():
+            return None
+        return move, found[1]
+
+
+class _BookPlayer:
+    """Stand-in player used while enumerating book positions."""
+
+
+def book_positions(plies, width=9, height=9):
+    """
+    Every position reachable in at most plies moves that is not over, each once up to symmetry.
+    Parameters:
+        plies: int, Number of moves (both players together) from the empty board
+        width: int, Board width
+        height: int, Board height
+    Returns:
+        {int: [(int, int)]}: Canonical position hash -> moves that lead to one of its orientations
+    """
+    board = Board(_BookPlayer(), _BookPlayer(), width, height, engine="bitboard")
+    board.track_symmetries()
+    positions = {}
+    line = []
+
+    def walk(ply):
+        key = board.get_canonical_hash()[0]
+        if key in positions:
+            return
+        positions[key] = list(line)
+        if ply == plies:
+            return
+        for move in board.get_active_moves():
+            is_over, winner = board.push_move(move)
+            if not is_over:
+                line.append(move)
+                walk(ply + 1)
+                line.pop()
+            board.pop_move()
+
+    walk(0)
+    return positions
+
+
+def search_position(factory, moves, width=9, height=9, time_limit=10000):
+    """
+    Let a fresh player search one book position. Meant to run in a worker process.
+    Parameters:
+        factory: callable, Returns a new player
+        moves: [(int, int)], Moves that lead to the position
+        width: int, Board width
+        height: int, Board height
+        time_limit: int, Milliseconds the player gets for the move
+    Returns:
+        (int, (int, int), int): Canonical position hash, chosen move in the canonical orientation (None
+        if the player's move was not legal) and depth_reached of the player
+    """
+    player_1, player_2 = factory(), factory()
+    board = Board(player_1, player_2, width, height, engine="bitboard")
+    for move in moves:
+        board.__apply_move__(move)
+    player = board.get_active_player()
+    time_left = Deadline(time_limit)
+    move = player.move(board.copy(), time_left)
+    key, symmetry = board.get_canonical_hash()
+    if move not in board.get_active_moves():
+        return key, None, getattr(player, "depth_reached", 0)
+    return key, board.to_canonical(tuple(move), symmetry), getattr(player, "depth_reached", 0)
+
+
+def write_book(path, entries, width=9, height=9):
+    """
+    Write a book file. The file is written next to path and renamed into place, so readers never see
+    a half written book. Entries without a move on the board (None, or the (-1, -1) a search returns
+    when it found nothing) are left out.
+    Parameters:
+        path: str, Book file
+        entries: {int: ((int, int), int)}, Canonical position hash -> canonical move and search depth
+        width: int, Board width
+        height: int, Board height
+    Returns:
+        int: Number of entries written
+    """
+    keys = [key for key in sorted(entries) if entries[key][0] is not None and
+            0 <= entries[key][0][0] < height and 0 <= entries[key][0][1] < width]
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, width, height, len(keys)))
+        for key in keys:
+            (col, row), depth = entries[key]
+            f.write(ENTRY.pack(key, col, row, min(depth, 255)))
+    os.replace(temp_path, path)
+    return len(keys)
+
+
+def build_book(path, factory, plies=1, width=9, height=9, time_limit=10000, workers=None, progress=None):
+    """
+    Search every position of the first plies moves and write the chosen moves to a book file.
+    Parameters:
+        path: str, Book file to write
+        factory: callable, Returns a new player; must be picklable
+        plies: int, Book depth in moves; 0 books only the first move, 1 also the replies to it
+        width, height: int, Board size
+        time_limit: int, Milliseconds of search per position
+        workers: int, Worker processes, defaults to the number of CPUs
+        progress: callable, Called with (done, total) after every position
+    Returns:
+        int: Number of entries written
+    """
+    positions = book_positions(plies, width, height)
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(search_position, factory, moves, width, height, time_limit)
+                   for moves in positions.values()]
+        for future in futures:
+            key, move, depth = future.result()
+            entries[key] = (move, depth)
+            if progress is not None:
+                progress(len(entries), len(futures))
+    return write_book(path, entries, width, height)
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Build an isolation opening book.")
+    parser.add_argument("output", help="book file to write")
+    parser.add_argument("--player", default="submission:CustomPlayer", help="player factory as module:attribute")
+    parser.add_argument("--player-kwargs", type=json.loads, default=None, help="JSON keyword arguments for the player")
+    parser.add_argument("--plies", type=int, default=1)
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--time-limit", type=int, default=10000, help="milliseconds of search per position")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print("\r%d/%d positions" % (done, total), end="", file=sys.stderr)
+
+    count = build_book(args.output, load_factory(args.player, args.player_kwargs), plies=args.plies,
+                       width=args.width, height=args.height, time_limit=args.time_limit,
+                       workers=args.workers, progress=progress)
+    print("\nwrote %d entries to %s" % (count, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
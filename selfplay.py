@@ -0,0 +1,362 @@
+"""
+Generate position/outcome datasets for tuning evaluation functions by letting a player play itself on a
+process pool. Every searched position is stored with its search score and the final result of the game,
+once per position up to symmetry (Board.get_canonical_hash), in numbered shard files:
+
+    python selfplay.py data/ --games 10000 --noise 0.1 --opening-plies 2 \
+        --player submission:CustomPlayer --player-kwargs '{"iterative": true}' --time-limit 500
+
+Workers play whole games and send back encoded samples; the main process only deduplicates and appends
+them to the current shard, and never has more than two games per worker in flight, so a slow disk holds
+the workers back instead of filling memory. Running the same command on an existing directory resumes:
+the shards are scanned for the positions already stored, every game not yet in the completion log is
+played (games finish out of order, so an interrupted run leaves gaps below its last game), and new
+games go to new shards.
+
+The completion log games.bin holds the number (uint32) of every finished game, appended once its
+samples are flushed; a game whose samples were all duplicates appears only there.
+
+Shard layout (little endian): the magic b"ISOSELF1", board width and height (uint16 each), then
+fixed-size samples:
+    game number (uint32), canonical position hash (uint64), side to move (uint8, queen 1 or 2),
+    queen 1 and queen 2 space index (uint16 each, 65535 before the queen's first move),
+    search score from the side to move's point of view (float32, NaN if the move did not come from a
+    search), search depth (uint8), space index of the move played (uint16),
+    result for the side to move (int8, 1 won, -1 lost),
+    followed by the occupancy bitmask (Board.get_occupancy_mask) in (width * height + 7) // 8 bytes.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import json
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+from isolation import Board, Deadline
+from tournament import load_factory, random_opening
+
+
+MAGIC = b"ISOSELF1"
+HEADER = struct.Struct("<8sHH")
+SAMPLE = struct.Struct("<IQBHHfBHb")
+NOT_MOVED_INDEX = 65535
+COMPLETED = struct.Struct("<I")
+COMPLETED_LOG = "games.bin"
+
+
+def occupancy_bytes(width, height):
+    """Bytes of the occupancy bitmask of one sample."""
+    return (width * height + 7) // 8
+
+
+def play_selfplay_game(factory, game_number, seed=0, noise=0.0, opening_plies=2, width=9, height=9,
+                       time_limit=1000, engine="bitboard"):
+    """
+    Play one game of a fresh player against another instance of itself and encode its positions.
+    Meant to run in a worker process.
+    Parameters:
+        factory: callable, Returns a new player
+        game_number: int, Number of the game; with seed it fixes the game's randomness
+        seed: int, Seed of the whole run
+        noise: float, Chance that a searched move is replaced by a random legal move, whose sample
+            then has no score and depth 0
+        opening_plies: int, Random moves played before the players take over (not stored)
+        width, height: int, Board size
+        time_limit: int, Milliseconds per move
+        engine: str, Board engine
+    Returns:
+        [(int, bytes)]: Canonical hash and encoded sample of every searched position
+    """
+    rng = random.Random("%d:%d" % (seed, game_number))
+    board = Board(factory(), factory(), width, height, engine=engine)
+    board.track_symmetries()
+    for move in random_opening(rng, opening_plies, width, height):
+        board.__apply_move__(move)
+
+    positions = []
+    winner = None
+    try:
+        while winner is None:
+            player = board.get_active_player()
+            key = board.get_canonical_hash()[0]
+            side = 1 if board.get_active_players_queen() == board.__queen_1__ else 2
+            queens = [board.__last_queen_move__[queen] for queen in (board.__queen_1__, board.__queen_2__)]
+            occupancy = board.get_occupancy_mask()
+
+            time_left = Deadline(time_limit)
+            move = player.move(board.copy(), time_left)
+            legal_moves = board.get_active_moves()
+            if move not in legal_moves:
+                # an illegal move loses, as in play_isolation
+                winner = 3 - side
+                break
+            score = getattr(player, "search_value", None)
+            depth = getattr(player, "depth_reached", 0)
+            if noise and rng.random() < noise:
+                # the search's score and depth belong to the searched move, not to this one
+                move = rng.choice(legal_moves)
+                score, depth = None, 0
+            positions.append((key, side, queens, score, depth, move, occupancy))
+
+            is_over, winning_queen = board.__apply_move__(move)
+            if is_over:
+                winner = 1 if winning_queen == board.__queen_1__ else 2
+    finally:
+        # stop pondering before the worker starts its next game
+        board.end_game()
+
+    size = occupancy_bytes(width, height)
+    samples = []
+    for key, side, queens, score, depth, move, occupancy in positions:
+        indices = [NOT_MOVED_INDEX if queen == Board.NOT_MOVED else queen[0] * width + queen[1] for queen in queens]
+        data = SAMPLE.pack(game_number, key, side, indices[0], indices[1],
+                           float("nan") if score is None else score, min(depth, 255),
+                           move[0] * width + move[1], 1 if side == winner else -1)
+        samples.append((key, data + occupancy.to_bytes(size, "little")))
+    return samples
+
+
+def read_shard(path):
+    """
+    Stream the samples of a shard file. A sample cut short by a crash at the end is skipped.
+    Parameters:
+        path: str, Shard file
+    Returns:
+        generator of dict: game, key, side, queens ((col, row) or Board.NOT_MOVED each), score (None
+        if there is none), depth, move, result, occupancy (int bitmask), width, height
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        magic, width, height = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("%s is not a self-play shard" % path)
+        size = occupancy_bytes(width, height)
+        while True:
+            data = f.read(SAMPLE.size + size)
+            if len(data) < SAMPLE.size + size:
+                return
+            game, key, side, queen_1, queen_2, score, depth, move, result = SAMPLE.unpack_from(data, 0)
+            yield {"game": game,
+                   "key": key,
+                   "side": side,
+                   "queens": [Board.NOT_MOVED if index == NOT_MOVED_INDEX else (index // width, index % width)
+                              for index in (queen_1, queen_2)],
+                   "score": None if math.isnan(score) else score,
+                   "depth": depth,
+                   "move": (move // width, move % width),
+                   "result": result,
+                   "occupancy": int.from_bytes(data[SAMPLE.size:], "little"),
+                   "width": width,
+                   "height": height}
+
+
+def shard_paths(directory):
+    """Shard files of a data directory in the order they were written."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith("shard-") and name.endswith(".bin"))
+
+
+def read_dataset(directory):
+    """
+    Stream every sample of a data directory, shard by shard.
+    Returns:
+        generator of dict: see read_shard
+    """
+    for path in shard_paths(directory):
+        for sample in read_shard(path):
+            yield sample
+
+
+class ShardWriter:
+    """Appends deduplicated samples to numbered shard files in a directory.
+
+    Opening a directory that already holds shards scans them first: the
+    positions stored there are never stored again, completed holds the games
+    the previous runs finished, and writing continues in a new shard.
+    """
+
+    def __init__(self, directory, width=9, height=9, shard_size=100000):
+        """
+        Args:
+            directory (str): Data directory, created if needed
+            width, height (int): Board size of the samples
+            shard_size (int): Samples per shard file
+        """
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.shard_size = shard_size
+        self.seen = set()
+        self.completed = set()
+        self.duplicates = 0
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+
+        paths = shard_paths(directory)
+        stored_games = set()
+        for sample in read_dataset(directory):
+            if (sample["width"], sample["height"]) != (width, height):
+                raise ValueError("%s holds %dx%d samples" % (directory, sample["width"], sample["height"]))
+            self.seen.add(sample["key"])
+            stored_games.add(sample["game"])
+        log_path = os.path.join(directory, COMPLETED_LOG)
+        if os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                data = f.read()
+            # a number cut short by a crash at the end is dropped
+            end = len(data) - len(data) % COMPLETED.size
+            self.completed.update(game for game, in COMPLETED.iter_unpack(data[:end]))
+            if end < len(data):
+                with open(log_path, "r+b") as f:
+                    f.truncate(end)
+        elif stored_games:
+            # shards of a run from before the log: count their games as completed
+            self.completed = stored_games
+            with open(log_path, "wb") as f:
+                f.write(b"".join(COMPLETED.pack(game) for game in sorted(stored_games)))
+        self.__shard__ = int(os.path.basename(paths[-1])[6:-4]) + 1 if paths else 0
+        self.__file__ = None
+        self.__count__ = 0
+        self.__log__ = open(log_path, "ab")
+
+    def write_game(self, game_number, samples):
+        """
+        Store the samples of one game whose positions were not stored before, flush them, and mark the
+        game completed.
+        Args:
+            game_number (int): Number of the game
+            samples (list): (canonical hash, encoded sample) pairs from play_selfplay_game
+        Returns:
+            int: Number of samples stored
+        """
+        new = []
+        for key, data in samples:
+            if key in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(key)
+                new.append(data)
+        for data in new:
+            if self.__file__ is None or self.__count__ >= self.shard_size:
+                self.__open_shard__()
+            self.__file__.write(data)
+            self.__count__ += 1
+        if self.__file__ is not None:
+            self.__file__.flush()
+        # only after the samples: a crash in between replays the game, whose samples are then duplicates
+        self.__log__.write(COMPLETED.pack(game_number))
+        self.__log__.flush()
+        self.completed.add(game_number)
+        self.written += len(new)
+        return len(new)
+
+    def __open_shard__(self):
+        if self.__file__ is not None:
+            self.__file__.close()
+        path = os.path.join(self.directory, "shard-%05d.bin" % self.__shard__)
+        self.__shard__ += 1
+        self.__file__ = open(path, "wb")
+        self.__file__.write(HEADER.pack(MAGIC, self.width, self.height))
+        self.__count__ = 0
+
+    def close(self):
+        if self.__file__ is not None:
+            self.__file__.close()
+            self.__file__ = None
+        self.__log__.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_selfplay(directory, factory, games=1000, workers=None, noise=0.0, opening_plies=2, width=9, height=9,
+                 time_limit=1000, engine="bitboard", seed=0, shard_size=100000):
+    """
+    Play self-play games on a process pool and store their positions, resuming an earlier run in the
+    same directory.
+    Parameters:
+        directory: str, Data directory
+        factory: callable, Returns a new player; must be picklable
+        games: int, Total number of games of the run, including those of earlier runs
+        workers: int, Worker processes, defaults to the number of CPUs
+        noise, opening_plies, width, height, time_limit, engine: see play_selfplay_game
+        seed: int, Seed of the run; keep it when resuming
+        shard_size: int, Samples per shard file
+    Returns:
+        generator of dict: One entry per finished game with its number, samples stored and running totals
+    """
+    workers = workers or os.cpu_count() or 1
+    with ShardWriter(directory, width, height, shard_size) as writer, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        todo = iter([game for game in range(games) if game not in writer.completed])
+        pending = {}
+        while True:
+            for game_number in todo:
+                pending[pool.submit(play_selfplay_game, factory, game_number, seed, noise, opening_plies,
+                                    width, height, time_limit, engine)] = game_number
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+
+            done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                samples = future.result()
+                game_number = pending.pop(future)
+                stored = writer.write_game(game_number, samples)
+                yield {"game": game_number,
+                       "positions": len(samples),
+                       "stored": stored,
+                       "total_stored": writer.written,
+                       "duplicates": writer.duplicates}
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Generate an isolation self-play dataset.")
+    parser.add_argument("directory", help="data directory; an existing one is resumed")
+    parser.add_argument("--player", default="submission:CustomPlayer", help="player factory as module:attribute")
+    parser.add_argument("--player-kwargs", type=json.loads, default=None, help="JSON keyword arguments for the player")
+    parser.add_argument("--games", type=int, default=1000, help="total games, including earlier runs")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=0.0, help="chance of playing a random move instead")
+    parser.add_argument("--opening-plies", type=int, default=2)
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--time-limit", type=int, default=1000)
+    parser.add_argument("--engine", choices=Board.ENGINES, default="bitboard")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = None
+    played = 0
+    for result in run_selfplay(args.directory, load_factory(args.player, args.player_kwargs), games=args.games,
+                               workers=args.workers, noise=args.noise, opening_plies=args.opening_plies,
+                               width=args.width, height=args.height, time_limit=args.time_limit,
+                               engine=args.engine, seed=args.seed, shard_size=args.shard_size):
+        played += 1
+        print("\rgame %d: %d positions stored, %d duplicates" % (result["game"], result["total_stored"],
+                                                                 result["duplicates"]), end="", file=sys.stderr)
+    seconds = time.perf_counter() - start
+    if played:
+        print(file=sys.stderr)
+    print(json.dumps({"games": played,
+                      "stored": result["total_stored"] if result else 0,
+                      "duplicates": result["duplicates"] if result else 0,
+                      "seconds": seconds,
+                      "games_per_second": played / seconds if seconds else None}))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,18 @@
 #################################################
 # file to edit: notebook.ipynb
 
+import math
+import os
+import threading
 import time
-from isolation import Board
+from concurrent.futures import ProcessPoolExecutor
+from isolation import Board, Deadline, _crater_masks, occupancy_array, batch_mobility
+
+# numpy is only needed for batched leaf evaluation (CustomPlayer(batch_leaves=True))
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Credits if any
 # 1)
@@ -35,7 +45,44 @@ class OpenMoveEvalFn:
 
             """
 
-        return len(game.get_player_moves(my_player)) - len(game.get_opponent_moves(my_player))
+        return game.get_player_mobility(my_player) - game.get_opponent_mobility(my_player)
+
+    def score_children(self, game, moves, my_player):
+        """Score the positions after each of the active player's moves at once
+        (see Board.get_children_mobility), the same as score() on each child.
+
+        Args:
+            game (Board): The board and game state.
+            moves (list): Legal moves of the active player
+            my_player (Player object): This specifies which player you are.
+
+        Returns:
+            (list, list): score of each child, and whether the move ends the
+            game (the opponent has no moves left), which the counts give for free
+        """
+        mover, opponent = game.get_children_mobility(moves)
+        if game.get_active_player() == my_player:
+            scores = mover - opponent
+        else:
+            scores = opponent - mover
+        return scores.tolist(), (opponent == 0).tolist()
+
+    def score_boards(self, boards, my_player):
+        """Score a list of boards of the same size at once, the same as score()
+        on each of them.
+
+        Args:
+            boards (list): Boards that my_player plays on
+            my_player (Player object): This specifies which player you are.
+
+        Returns:
+            list: score of each board
+        """
+        width, height = boards[0].width, boards[0].height
+        occupancy = occupancy_array([board.get_occupancy_mask() for board in boards], width, height)
+        mine = batch_mobility(occupancy, [board.get_player_position(my_player) for board in boards], width, height)
+        theirs = batch_mobility(occupancy, [board.get_opponent_position(my_player) for board in boards], width, height)
+        return (mine - theirs).tolist()
 
 
 ######################################################################
@@ -45,6 +92,443 @@ class OpenMoveEvalFn:
 ##### CODE BELOW IS USED FOR RUNNING LOCAL TEST DON'T MODIFY IT ######
 ################ END OF LOCAL TEST CODE SECTION ######################
 
+class TranspositionTable:
+    """Fixed-size transposition table for alphabeta, keyed by Board.get_zobrist_hash().
+
+    Every slot holds two entries: a depth-preferred one, only replaced by a search
+    at least as deep (or by anything once it is left over from an older search),
+    and an always-replace one that takes whatever the depth-preferred entry
+    refused. The number of slots is derived from a memory budget up front, so the
+    table never grows no matter how many games it is used for.
+    """
+
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    # Rough CPython footprint of one entry: the entry tuple, its key and value
+    # ints, plus the list slot pointing at it. Move tuples are shared with the board.
+    ENTRY_BYTES = 160
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Args:
+            max_bytes (int): Memory budget of the table in bytes
+        """
+        self.slots = max(1, max_bytes // (2 * self.ENTRY_BYTES))
+        self.__deep__ = [None] * self.slots
+        self.__recent__ = [None] * self.slots
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """Mark the entries stored so far as belonging to an older search."""
+        self.generation += 1
+
+    def clear(self):
+        """Drop every entry."""
+        self.__deep__ = [None] * self.slots
+        self.__recent__ = [None] * self.slots
+
+    def probe(self, key):
+        """Look up a position.
+
+        Args:
+            key (int): Position key
+
+        Returns:
+            tuple: (key, depth, flag, value, best_move, generation) or None
+        """
+        self.probes += 1
+        index = key % self.slots
+        entry = self.__deep__[index]
+        if entry is None or entry[0] != key:
+            entry = self.__recent__[index]
+            if entry is None or entry[0] != key:
+                return None
+        self.hits += 1
+        return entry
+
+    def store(self, key, depth, flag, value, best_move):
+        """Record the result of searching a position.
+
+        Args:
+            key (int): Position key
+            depth (int): Depth the position was searched to
+            flag (int): EXACT, LOWER (value is a lower bound) or UPPER (value is an upper bound)
+            value (int): Search value
+            best_move (tuple): Best move found, (-1, -1) if none
+        """
+        index = key % self.slots
+        entry = (key, depth, flag, value, best_move, self.generation)
+        deep = self.__deep__[index]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.generation:
+            self.__deep__[index] = entry
+        else:
+            self.__recent__[index] = entry
+
+
+class MoveOrderer:
+    """Orders the moves alphabeta searches so that beta cutoffs come early.
+
+    Moves are tried in this order:
+        1. the hash move (best move stored in the transposition table) or,
+           without one, the best move of the previous iteration at the root
+        2. killer moves: moves that caused a cutoff at the same ply before
+        3. everything else, ranked by the history table (cutoffs a move caused
+           anywhere, weighted by depth) and by how few moves the opponent has
+           left after the move
+
+    Each stage can be tuned or switched off through the constructor. With
+    log_cutoffs the orderer also counts how early cutoffs happen, see stats().
+    """
+
+    def __init__(self, killers=2, history_weight=1, mobility_weight=4, mobility_min_depth=3, log_cutoffs=False):
+        """
+        Args:
+            killers (int): Killer moves remembered per ply, 0 to disable
+            history_weight (float): Weight of the history score, 0 to disable
+            mobility_weight (float): Weight of the opponent mobility left after
+                the move, 0 to disable
+            mobility_min_depth (int): Only rank by opponent mobility when at
+                least this much depth is left; near the leaves it costs about
+                as much as the search it saves
+            log_cutoffs (bool): Count nodes and cutoffs for stats()
+        """
+        self.killers = killers
+        self.history_weight = history_weight
+        self.mobility_weight = mobility_weight
+        self.mobility_min_depth = mobility_min_depth
+        self.log_cutoffs = log_cutoffs
+        self.__killers__ = {}
+        self.__history__ = {}
+        self.__previous_best__ = (None, None)
+        self.reset_stats()
+
+    def new_search(self):
+        """Forget the killers and halve the history scores before a new move."""
+        self.__killers__ = {}
+        self.__history__ = {key: score // 2 for key, score in self.__history__.items() if score > 1}
+        self.__previous_best__ = (None, None)
+
+    def set_previous_best(self, game, move):
+        """Remember the best move found for game, tried first when game is searched again."""
+        self.__previous_best__ = (game.get_zobrist_hash(), move)
+
+    def order(self, game, moves, hash_move, my_turn, depth):
+        """Sort the moves of a node.
+
+        Args:
+            game (Board): The position the moves are played from
+            moves ([(int, int)]): Legal moves of the side to move
+            hash_move (tuple): Best move from the transposition table, or None
+            my_turn (bool): Whether the searching player is the side to move
+            depth (int): Depth left below the node
+
+        Returns:
+            [(int, int)]: The same moves, best candidates first
+        """
+        if self.log_cutoffs:
+            self.nodes += 1
+        if len(moves) < 2:
+            return moves
+        if hash_move is None and self.__previous_best__[0] == game.get_zobrist_hash():
+            hash_move = self.__previous_best__[1]
+
+        scores = {}
+        if self.history_weight:
+            history = self.__history__
+            for move in moves:
+                scores[move] = self.history_weight * history.get((my_turn, move), 0)
+        else:
+            for move in moves:
+                scores[move] = 0
+        if self.mobility_weight and depth >= self.mobility_min_depth:
+            for move in moves:
+                game.push_move(move)
+                scores[move] -= self.mobility_weight * game.get_active_mobility()
+                game.pop_move()
+        # killers and the hash move go in front of anything the scores can say
+        top = max(scores.values()) + 1
+        for rank, move in enumerate(self.__killers__.get(game.move_count, ())):
+            if move in scores:
+                scores[move] = top + self.killers - rank
+        if hash_move in scores:
+            scores[hash_move] = top + self.killers + 1
+
+        return sorted(moves, key=scores.__getitem__, reverse=True)
+
+    def record_cutoff(self, game, move, my_turn, depth, index):
+        """Learn from a cutoff.
+
+        Args:
+            game (Board): The position the cutoff happened in
+            move (tuple): The move that caused it
+            my_turn (bool): Whether the searching player was the side to move
+            depth (int): Depth left below the node
+            index (int): Position of move in the ordered list
+        """
+        if self.killers:
+            killers = self.__killers__.setdefault(game.move_count, [])
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.killers:]
+        if self.history_weight:
+            key = (my_turn, move)
+            self.__history__[key] = self.__history__.get(key, 0) + depth * depth
+        if self.log_cutoffs:
+            self.cutoffs += 1
+            if index == 0:
+                self.first_move_cutoffs += 1
+            self.cutoff_index[index] = self.cutoff_index.get(index, 0) + 1
+
+    def reset_stats(self):
+        """Zero the counters behind stats()."""
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_index = {}
+
+    def stats(self):
+        """Cutoff statistics collected with log_cutoffs.
+
+        Returns:
+            dict: nodes ordered, cutoffs, cutoffs on the first move, the share
+            of cutoffs on the first move and a histogram of cutoff positions
+        """
+        return {"nodes": self.nodes,
+                "cutoffs": self.cutoffs,
+                "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+                "cutoff_index": dict(sorted(self.cutoff_index.items()))}
+
+
+class SearchStats:
+    """Opt-in counters for minimax, alphabeta and pvs.
+
+    The search functions look for a search_stats attribute on the player and
+    only do any bookkeeping when it is set, so a player without one pays a
+    single attribute lookup per node. Plies are counted from the position
+    passed to reset(); per ply the stats keep the nodes visited, the nodes
+    that were expanded into children, and beta (on our turn) and alpha (on
+    the opponent's turn) cutoffs. Every finished search depth is recorded as
+    an iteration with its time and node count.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, game=None):
+        """Zero all counters; plies are counted from game from now on."""
+        self.root_ply = game.move_count if game is not None else 0
+        self.nodes = []
+        self.expanded = []
+        self.leaves = 0
+        self.beta_cutoffs = 0
+        self.alpha_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.iterations = []
+        self.__start__ = time.perf_counter()
+        self.__iteration_start__ = self.__start__
+        self.__iteration_nodes__ = 0
+
+    def visit(self, game):
+        """Count a node at game's ply."""
+        ply = game.move_count - self.root_ply
+        while len(self.nodes) <= ply:
+            self.nodes.append(0)
+            self.expanded.append(0)
+        self.nodes[ply] += 1
+
+    def visit_children(self, game, count):
+        """Count count leaf nodes one ply below game that were scored in a batch."""
+        ply = game.move_count - self.root_ply + 1
+        while len(self.nodes) <= ply:
+            self.nodes.append(0)
+            self.expanded.append(0)
+        self.nodes[ply] += count
+        self.leaves += count
+
+    def expand(self, game):
+        """Count a node at game's ply whose children are about to be searched."""
+        self.expanded[game.move_count - self.root_ply] += 1
+
+    def leaf(self):
+        """Count a call to the evaluation function."""
+        self.leaves += 1
+
+    def cutoff(self, my_turn, index):
+        """Count a cutoff after searching index + 1 children."""
+        if my_turn:
+            self.beta_cutoffs += 1
+        else:
+            self.alpha_cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+    def iteration(self, depth):
+        """Record that a search to depth finished."""
+        now = time.perf_counter()
+        nodes = sum(self.nodes)
+        self.iterations.append({"depth": depth,
+                                "seconds": now - self.__iteration_start__,
+                                "nodes": nodes - self.__iteration_nodes__})
+        self.__iteration_start__ = now
+        self.__iteration_nodes__ = nodes
+
+    def as_dict(self):
+        """The statistics as plain JSON-serialisable data.
+
+        Returns:
+            dict: total nodes and leaf evaluations, per ply nodes, expanded
+            nodes and effective branching factor (nodes at the next ply per
+            expanded node), cutoff counts, iterations and elapsed seconds
+        """
+        cutoffs = self.beta_cutoffs + self.alpha_cutoffs
+        plies = []
+        for ply, nodes in enumerate(self.nodes):
+            expanded = self.expanded[ply]
+            children = self.nodes[ply + 1] if ply + 1 < len(self.nodes) else 0
+            plies.append({"ply": ply,
+                          "nodes": nodes,
+                          "expanded": expanded,
+                          "branching_factor": children / expanded if expanded else None})
+        return {"nodes": sum(self.nodes),
+                "leaves": self.leaves,
+                "beta_cutoffs": self.beta_cutoffs,
+                "alpha_cutoffs": self.alpha_cutoffs,
+                "first_move_cutoffs": self.first_move_cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoffs / cutoffs if cutoffs else None,
+                "plies": plies,
+                "iterations": self.iterations,
+                "seconds": time.perf_counter() - self.__start__}
+
+
+class SolverTimeout(Exception):
+    """Raised inside EndgameSolver when it runs out of time."""
+
+
+class EndgameSolver:
+    """Exact solver for partitioned positions (see Board.is_partitioned).
+
+    Once the queens are walled off from each other the opponent's moves no
+    longer matter to us: the game is decided by who can make more moves in
+    their own region, so the best move is the first move of the longest path
+    our queen can walk through its region. That is a single-agent search over
+    (position, blank spaces of the region) states, with the impact craters of
+    long moves taken into account, and it is memoized on those states. The
+    states are bitmasks over the whole board, so the memo stays valid from one
+    move to the next.
+    """
+
+    def __init__(self, time_fraction=0.5, max_entries=1000000):
+        """
+        Args:
+            time_fraction (float): Share of time_left the solver may use before
+                giving up, leaving the rest for a regular search
+            max_entries (int): Memo entries kept before the memo is cleared
+        """
+        self.time_fraction = time_fraction
+        self.max_entries = max_entries
+        self.__memo__ = {}
+        self.__size__ = None
+        self.nodes = 0
+
+    def __getstate__(self):
+        """The memo stays behind when the solver is pickled."""
+        state = self.__dict__.copy()
+        state["__memo__"] = {}
+        return state
+
+    def best_move(self, player, game, time_left):
+        """Find the move that leaves player the longest path through its region.
+
+        Args:
+            player (CustomPlayer): The player to move
+            game (Board): A partitioned board and game state
+            time_left (function): Used to determine time left before timeout
+
+        Returns:
+            (tuple, int): best move and the number of moves player can still
+            make by following the longest path, or None if the solver ran out
+            of its share of the time
+        """
+        if self.__size__ != (game.width, game.height):
+            self.__size__ = (game.width, game.height)
+            self.__memo__ = {}
+        elif len(self.__memo__) > self.max_entries:
+            self.__memo__ = {}
+
+        start = time.perf_counter()
+        budget = time_left() * self.time_fraction
+
+        def budget_left():
+            return budget - 1000 * (time.perf_counter() - start)
+
+        position = game.get_player_position(player)
+        open_spaces = game.get_region_mask(position)
+        try:
+            length, move = self.__longest__(game, position[0] * game.width + position[1], open_spaces, budget_left)
+        except SolverTimeout:
+            return None
+        return move, length
+
+    def longest_path(self, game, position, time_left):
+        """Length of the longest path a queen on position can walk through its region.
+
+        Args:
+            game (Board): A board and game state
+            position ((int, int)): Queen position
+            time_left (function): Used to determine time left before timeout
+
+        Returns:
+            int: Number of moves; raises SolverTimeout when time runs out
+        """
+        open_spaces = game.get_region_mask(position)
+        return self.__longest__(game, position[0] * game.width + position[1], open_spaces, time_left)[0]
+
+    def __longest__(self, game, index, open_spaces, time_left):
+        """Longest path from space index over the spaces set in open_spaces.
+
+        Returns:
+            (int, tuple): number of moves and the first move, None if there is none
+        """
+        key = (index, open_spaces)
+        memo = self.__memo__
+        if key in memo:
+            return memo[key]
+
+        self.nodes += 1
+        if not self.nodes & 1023 and time_left() < 100:
+            raise SolverTimeout()
+
+        width = game.width
+        craters = _crater_masks(width, game.height)
+        # no path can use more moves than there are open spaces
+        bound = bin(open_spaces).count("1")
+        best, best_move = 0, None
+        for ray in game.__rays__[index]:
+            for distance, (cell, bit) in enumerate(ray):
+                if not open_spaces & bit:
+                    break
+                target = cell[0] * width + cell[1]
+                rest = open_spaces & ~bit
+                if distance:
+                    # moves longer than one space leave an impact crater
+                    rest &= ~craters[target]
+                length = 1 + self.__longest__(game, target, rest, time_left)[0]
+                if length > best:
+                    best, best_move = length, cell
+                    if best == bound:
+                        break
+            if best == bound:
+                break
+
+        memo[key] = (best, best_move)
+        return best, best_move
+
+
 class CustomPlayer:
     # TODO: finish this class!
     """Player that chooses a move using your evaluation function
@@ -52,7 +536,9 @@ class CustomPlayer:
     You must finish and test this player to make sure it properly
     uses minimax and alpha-beta to return a good move."""
 
-    def __init__(self, search_depth=4, eval_fn=OpenMoveEvalFn()):
+    def __init__(self, search_depth=4, eval_fn=OpenMoveEvalFn(), transposition_table=None, iterative=False,
+                 move_orderer=None, parallel=None, collect_stats=False, endgame=True,
+                 opening_book=None, batch_leaves=False, symmetry=False, ponder=None, pvs=False):
         """Initializes your player.
 
         if you find yourself with a superior eval function, update the default
@@ -61,9 +547,47 @@ class CustomPlayer:
         Args:
             search_depth (int): The depth to which your agent will search
             eval_fn (function): Evaluation function used by your agent
+            transposition_table (TranspositionTable): Table alphabeta reuses
+                results from, None to search without one
+            iterative (bool): Deepen until the time budget of the move runs out
+                instead of searching to search_depth
+            move_orderer (MoveOrderer): Orders the moves alphabeta tries, None
+                to search them in generation order
+            parallel (ParallelSearch): Split the root moves over its worker
+                processes (always deepening on time), None to search here
+            collect_stats (bool): Keep SearchStats of every move in search_stats
+            endgame (bool): Play partitioned positions with an EndgameSolver
+            opening_book (OpeningBook): Book of precomputed moves played
+                without searching, None to always search
+            batch_leaves (bool): Score all children of a node one move from the
+                search horizon in one numpy batch (see utility_children)
+            symmetry (bool): Key the transposition table on the canonical
+                position (Board.get_canonical_hash), so symmetric positions
+                share entries
+            ponder (Ponderer): Keep searching on a background thread while the
+                opponent thinks, None to sit idle
+            pvs (bool): Search with pvs (and pvs_deepening when iterative)
+                instead of alphabeta, keeping the principal variation in
+                principal_variation
         """
         self.eval_fn = eval_fn
         self.search_depth = search_depth
+        self.transposition_table = transposition_table
+        self.iterative = iterative
+        self.move_orderer = move_orderer
+        self.parallel = parallel
+        self.search_stats = SearchStats() if collect_stats else None
+        self.endgame_solver = EndgameSolver() if endgame else None
+        self.opening_book = opening_book
+        self.batch_leaves = batch_leaves
+        self.symmetry = symmetry
+        self.ponder = ponder
+        self.pvs = pvs
+        # depth and value of the search the last move came from; the value
+        # is None for moves that did not come from alphabeta (book, endgame)
+        self.depth_reached = 0
+        self.search_value = None
+        self.principal_variation = []
 
     def move(self, game, time_left):
         """Called to determine one move by your agent
@@ -79,13 +603,108 @@ class CustomPlayer:
         Returns:
             tuple: (int,int): Your best move
         """
-        best_move, utility = alphabeta(self, game, time_left, depth=self.search_depth)
+        if self.ponder is None:
+            return self.__choose_move__(game, time_left)
+        pondered = self.ponder.take(self, game)
+        if pondered is not None:
+            best_move, self.search_value, self.depth_reached = pondered
+            self.principal_variation = []
+            if self.search_stats is not None:
+                # the pondering nodes were counted on the opponent's time
+                self.search_stats.reset(game)
+        else:
+            best_move = self.__choose_move__(game, time_left)
+        if best_move is None:
+            return best_move
+        is_over, winner = game.push_move(best_move)
+        game.pop_move()
+        if not is_over:
+            # nothing to ponder once the opponent has no reply
+            self.ponder.start(self, game, best_move)
+        return best_move
+
+    def end_game(self):
+        """Called when the game is over (see Board.end_game): stops pondering."""
+        if self.ponder is not None:
+            self.ponder.cancel()
+
+    def __choose_move__(self, game, time_left):
+        """Search (or look up) the move to play in game, see move()."""
+        self.search_value = None
+        self.principal_variation = []
+        if self.opening_book is not None:
+            booked = self.opening_book.lookup(game)
+            if booked is not None:
+                best_move, self.depth_reached = booked
+                return best_move
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+            if self.symmetry:
+                game.track_symmetries()
+        if self.move_orderer is not None:
+            self.move_orderer.new_search()
+        if self.search_stats is not None:
+            self.search_stats.reset(game)
+        if self.endgame_solver is not None and game.is_partitioned():
+            solved = self.endgame_solver.best_move(self, game, time_left)
+            if solved is not None and solved[0] is not None:
+                # the depth of a solved endgame is the rest of our game
+                best_move, self.depth_reached = solved
+                return best_move
+        if self.parallel is not None:
+            best_move, self.search_value, self.depth_reached = self.parallel.search(self, game, time_left)
+            return best_move
+        if self.pvs and self.iterative:
+            best_move, self.search_value, self.depth_reached, self.principal_variation = \
+                pvs_deepening(self, game, time_left)
+            return best_move
+        if self.iterative:
+            best_move, self.search_value, self.depth_reached = iterative_deepening(self, game, time_left)
+            return best_move
+        if self.pvs:
+            best_move, self.search_value, self.principal_variation = pvs(self, game, time_left, self.search_depth)
+        else:
+            best_move, self.search_value = alphabeta(self, game, time_left, depth=self.search_depth)
+        self.depth_reached = self.search_depth
+        if self.search_stats is not None:
+            self.search_stats.iteration(self.search_depth)
         return best_move
 
     def utility(self, game, my_turn):
         """You can handle special cases here (e.g. endgame)"""
         return self.eval_fn.score(game, self)
 
+    def utility_children(self, game, moves):
+        """Utility of the position after each of the active player's moves.
+
+        Batched through eval_fn.score_children when numpy is installed and the
+        batch gives what utility() would: the evaluation function scores with
+        OpenMoveEvalFn.score and utility() is not overridden. Otherwise one
+        child at a time.
+
+        Returns:
+            (list, list): utility of each child and whether the move ends the game
+        """
+        if np is not None and hasattr(self.eval_fn, "score_children") and \
+                getattr(type(self.eval_fn), "score", None) is OpenMoveEvalFn.score and \
+                type(self).utility is CustomPlayer.utility:
+            return self.eval_fn.score_children(game, moves, self)
+        scores, game_over = [], []
+        for move in moves:
+            is_over, winner = game.push_move(move)
+            scores.append(self.utility(game, game.get_active_player() == self))
+            game_over.append(is_over)
+            game.pop_move()
+        return scores, game_over
+
+    def __getstate__(self):
+        """The process pool and the transposition table stay behind when the
+        player is pickled (e.g. to send it to a worker process)."""
+        state = self.__dict__.copy()
+        state["parallel"] = None
+        state["transposition_table"] = None
+        return state
+
 ###################################################################
 ########## DON'T WRITE ANY CODE OUTSIDE THE CLASS! ################
 ###### IF YOU WANT TO CALL OR TEST IT CREATE A NEW CELL ###########
@@ -112,19 +731,32 @@ def minimax(player, game, time_left, depth, my_turn=True):
     my_actions = game.get_player_moves(player)
     opp_actions = game.get_opponent_moves(player)
 
+    stats = getattr(player, "search_stats", None)
+    if stats is not None:
+        stats.visit(game)
+
     if depth == 0:
+        if stats is not None:
+            stats.leaf()
         return ((-1, -1), player.utility(game, my_turn))
 
+    if stats is not None:
+        stats.expand(game)
+
     if my_turn:
             #representation of infinity
             val = -1000
 
             for a in my_actions:
-                var1 = game.forecast_move(a)
-                score = minimax(player, var1[0], time_left, depth-1, False)
+                # walk the tree on this board; pop_move restores it before scoring
+                is_over, winner = game.push_move(a)
+                score = minimax(player, game, time_left, depth-1, False)
+                game.pop_move()
 
                 #termination condition
-                if var1[1]:
+                if is_over:
+                    if stats is not None:
+                        stats.leaf()
                     score = (a, player.utility(game, False))
 
                 #need to maximize score here!
@@ -138,12 +770,15 @@ def minimax(player, game, time_left, depth, my_turn=True):
             val = 1000
 
             for a in opp_actions:
-                var2 = game.forecast_move(a)
-                score = minimax(player, var2[0], time_left, depth-1, True)
+                is_over, winner = game.push_move(a)
+                score = minimax(player, game, time_left, depth-1, True)
+                game.pop_move()
 
 
                 #termination condition
-                if var2[1]:
+                if is_over:
+                    if stats is not None:
+                        stats.leaf()
                     score = (a, player.utility(game, True))
 
                 #need to minimize score here!
@@ -182,22 +817,90 @@ def alphabeta(player, game, time_left, depth, alpha=float("-inf"), beta=float("i
     """
 
     best_move = (-1, -1)
-    my_actions = game.get_player_moves(player)
-    opp_actions = game.get_opponent_moves(player)
 
-    if depth == 0 or time_left() < 100:
+    stats = getattr(player, "search_stats", None)
+    if stats is not None:
+        stats.visit(game)
+
+    # a Deadline has a cheap amortised check, plain time_left functions are called at every node
+    expired = getattr(time_left, "expired", None)
+    if depth == 0 or (expired() if expired is not None else time_left() < 100):
+        if stats is not None:
+            stats.leaf()
         return ((-1, -1), player.utility(game, my_turn))
 
+    hash_move = None
+    tt = getattr(player, "transposition_table", None)
+    if tt is not None:
+        # symmetric positions share entries, which store their move in the canonical orientation
+        symmetry = None
+        if getattr(player, "symmetry", False):
+            key, symmetry = game.get_canonical_hash()
+        else:
+            key = game.get_zobrist_hash()
+        # values are from player's point of view, so whose turn it is belongs in the key
+        key ^= 0 if my_turn else _OPPONENT_TURN_KEY
+        entry = tt.probe(key)
+        if entry is not None:
+            stored_move = entry[4] if symmetry is None else game.from_canonical(entry[4], symmetry)
+            if entry[1] >= depth:
+                flag, value = entry[2], entry[3]
+                if flag == TranspositionTable.EXACT or \
+                        (flag == TranspositionTable.LOWER and value >= beta) or \
+                        (flag == TranspositionTable.UPPER and value <= alpha):
+                    return (stored_move, value)
+            hash_move = stored_move
+        alpha_orig, beta_orig = alpha, beta
+
+    if stats is not None:
+        stats.expand(game)
+
+    # only the side to move needs its moves, and leaves need none
+    if my_turn:
+        my_actions = game.get_player_moves(player)
+    else:
+        opp_actions = game.get_opponent_moves(player)
+
+    orderer = getattr(player, "move_orderer", None)
+    if orderer is not None:
+        if my_turn:
+            my_actions = orderer.order(game, my_actions, hash_move, True, depth)
+        else:
+            opp_actions = orderer.order(game, opp_actions, hash_move, False, depth)
+    elif hash_move is not None:
+        # search the stored best move first
+        actions = my_actions if my_turn else opp_actions
+        if hash_move in actions:
+            actions.remove(hash_move)
+            actions.insert(0, hash_move)
+
+    # one move from the horizon every child is a leaf: score them all in one batch,
+    # unless there are so few that scoring them one by one with cutoffs is cheaper
+    leaf_scores = None
+    if depth == 1 and getattr(player, "batch_leaves", False):
+        actions = my_actions if my_turn else opp_actions
+        if len(actions) >= BATCH_MIN_CHILDREN:
+            leaf_scores, leaf_over = player.utility_children(game, actions)
+            if stats is not None:
+                stats.visit_children(game, len(actions))
+
     if my_turn:
             #representation of neg infinity
             val = -1000
 
-            for a in my_actions:
-                var1 = game.forecast_move(a)
-                score = alphabeta(player, var1[0], time_left, depth-1, alpha, beta, False)
+            for i, a in enumerate(my_actions):
+                if leaf_scores is not None:
+                    is_over, score = leaf_over[i], (a, leaf_scores[i])
+                else:
+                    # walk the tree on this board; pop_move restores it before scoring
+                    is_over, winner = game.push_move(a)
+                    score = alphabeta(player, game, time_left, depth-1, alpha, beta, False)
+                    game.pop_move()
 
                 #termination condition
-                if var1[1]:
+                if is_over:
+                    if stats is not None:
+                        stats.leaf()
                     score = (a, player.utility(game, False))
 
                 #need to maximize score here!
@@ -207,20 +910,30 @@ def alphabeta(player, game, time_left, depth, alpha=float("-inf"), beta=float("i
                     alpha = max(alpha, val)
 
                 if val >= beta:
-                    return (best_move, val)
+                    if orderer is not None:
+                        orderer.record_cutoff(game, best_move, True, depth, i)
+                    if stats is not None:
+                        stats.cutoff(True, i)
+                    break
 
 
     else:
             #representation of pos infinity
             val = 1000
 
-            for a in opp_actions:
-                var2 = game.forecast_move(a)
-                score = alphabeta(player, var2[0], time_left, depth-1, alpha, beta, True)
+            for i, a in enumerate(opp_actions):
+                if leaf_scores is not None:
+                    is_over, score = leaf_over[i], (a, leaf_scores[i])
+                else:
+                    is_over, winner = game.push_move(a)
+                    score = alphabeta(player, game, time_left, depth-1, alpha, beta, True)
+                    game.pop_move()
 
 
                 #termination condition
-                if var2[1]:
+                if is_over:
+                    if stats is not None:
+                        stats.leaf()
                     score = (a, player.utility(game, True))
 
                 #need to minimize score here!
@@ -230,10 +943,607 @@ def alphabeta(player, game, time_left, depth, alpha=float("-inf"), beta=float("i
                     beta = min(beta, val)
 
                 if val <= alpha:
-                    return (best_move, val)
+                    if orderer is not None:
+                        orderer.record_cutoff(game, best_move, False, depth, i)
+                    if stats is not None:
+                        stats.cutoff(False, i)
+                    break
+
+    # a result cut short by the clock is not a real search result
+    if tt is not None and not (expired() if expired is not None else time_left() < 100):
+        if val <= alpha_orig:
+            flag = TranspositionTable.UPPER
+        elif val >= beta_orig:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        tt.store(key, depth, flag, val, best_move if symmetry is None else game.to_canonical(best_move, symmetry))
 
     return (best_move, val)
 
+
+
+def pvs(player, game, time_left, depth, alpha=float("-inf"), beta=float("inf"), my_turn=True):
+    """Principal variation search, a negamax alternative to alphabeta.
+
+    The first move of every node (the hash or previous best move, if there is a
+    move orderer or transposition table) is searched with the full window.
+    Every later move only gets a null window just above alpha, which is enough
+    to prove it is no better; a move that fails high is searched again with the
+    full window. Values are from the point of view of the side to move (the
+    negation of the parent's), fail-soft, with real infinities for the bounds.
+    Leaves and game-ending moves are scored exactly as alphabeta scores them,
+    so both return the same value at the same depth, and the transposition
+    table entries are stored from player's point of view like alphabeta's, so
+    the two can share a table.
+
+    Args:
+        player (CustomPlayer): The player searching, see alphabeta
+        game (Board): A board and game state.
+        time_left (function): Used to determine time left before timeout
+        depth: Used to track how deep you are in the search tree
+        alpha (float): Lower bound of the window, for the side to move
+        beta (float): Upper bound of the window, for the side to move
+        my_turn (bool): True if player is the side to move
+
+    Returns:
+        (tuple, float, list): best_move, val for the side to move and the
+        principal variation (the moves both sides are expected to play from
+        here, starting with best_move; it stops early at a transposition
+        table hit or the end of the game)
+    """
+    sign = 1 if my_turn else -1
+
+    stats = getattr(player, "search_stats", None)
+    if stats is not None:
+        stats.visit(game)
+
+    expired = getattr(time_left, "expired", None)
+    if depth == 0 or (expired() if expired is not None else time_left() < 100):
+        if stats is not None:
+            stats.leaf()
+        return (-1, -1), sign * player.utility(game, my_turn), []
+
+    hash_move = None
+    tt = getattr(player, "transposition_table", None)
+    if tt is not None:
+        symmetry = None
+        if getattr(player, "symmetry", False):
+            key, symmetry = game.get_canonical_hash()
+        else:
+            key = game.get_zobrist_hash()
+        key ^= 0 if my_turn else _OPPONENT_TURN_KEY
+        entry = tt.probe(key)
+        if entry is not None:
+            stored_move = entry[4] if symmetry is None else game.from_canonical(entry[4], symmetry)
+            if entry[1] >= depth:
+                flag, value = entry[2], sign * entry[3]
+                if flag != TranspositionTable.EXACT and not my_turn:
+                    # a bound for player is the opposite bound for the opponent
+                    flag = TranspositionTable.UPPER if flag == TranspositionTable.LOWER else TranspositionTable.LOWER
+                if flag == TranspositionTable.EXACT or \
+                        (flag == TranspositionTable.LOWER and value >= beta) or \
+                        (flag == TranspositionTable.UPPER and value <= alpha):
+                    return stored_move, value, [stored_move]
+            hash_move = stored_move
+        alpha_orig = alpha
+
+    if stats is not None:
+        stats.expand(game)
+
+    actions = game.get_player_moves(player) if my_turn else game.get_opponent_moves(player)
+    orderer = getattr(player, "move_orderer", None)
+    if orderer is not None:
+        actions = orderer.order(game, actions, hash_move, my_turn, depth)
+    elif hash_move is not None and hash_move in actions:
+        actions.remove(hash_move)
+        actions.insert(0, hash_move)
+
+    leaf_scores = None
+    if depth == 1 and getattr(player, "batch_leaves", False) and len(actions) >= BATCH_MIN_CHILDREN:
+        leaf_scores, leaf_over = player.utility_children(game, actions)
+        if stats is not None:
+            stats.visit_children(game, len(actions))
+
+    best_move, val, line = (-1, -1), float("-inf"), []
+    for i, a in enumerate(actions):
+        child_line = []
+        if leaf_scores is not None:
+            is_over, score = leaf_over[i], sign * leaf_scores[i]
+        else:
+            is_over, winner = game.push_move(a)
+            if is_over:
+                score = None
+            elif i == 0:
+                child_line, score = _negated(pvs(player, game, time_left, depth-1, -beta, -alpha, not my_turn))
+            else:
+                # the smallest window above alpha: only tells whether a is better
+                null_beta = math.nextafter(alpha, math.inf)
+                child_line, score = _negated(pvs(player, game, time_left, depth-1, -null_beta, -alpha, not my_turn))
+                # a leaf's score is exact whatever the window
+                if alpha < score < beta and depth > 1:
+                    child_line, score = _negated(pvs(player, game, time_left, depth-1, -beta, -alpha, not my_turn))
+            game.pop_move()
+
+        if is_over:
+            if stats is not None:
+                stats.leaf()
+            # same scoring alphabeta uses for a move that ends the game
+            score = sign * player.utility(game, not my_turn)
+            child_line = []
+
+        if score > val:
+            best_move, val, line = a, score, [a] + child_line
+            alpha = max(alpha, val)
+
+        if val >= beta:
+            if orderer is not None:
+                orderer.record_cutoff(game, best_move, my_turn, depth, i)
+            if stats is not None:
+                stats.cutoff(my_turn, i)
+            break
+
+    if tt is not None and not (expired() if expired is not None else time_left() < 100):
+        if val <= alpha_orig:
+            flag = TranspositionTable.UPPER
+        elif val >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        if flag != TranspositionTable.EXACT and not my_turn:
+            flag = TranspositionTable.UPPER if flag == TranspositionTable.LOWER else TranspositionTable.LOWER
+        tt.store(key, depth, flag, sign * val, best_move if symmetry is None else game.to_canonical(best_move, symmetry))
+
+    return best_move, val, line
+
+
+def _negated(result):
+    """Principal variation and value of a child pvs result, seen from the parent."""
+    return result[2], -result[1]
+
+
+# Xored into the position key when alphabeta scores a node on the opponent's turn
+_OPPONENT_TURN_KEY = 0x5DEECE66D5DEECE6
+
+# Fewest children alphabeta scores as one batch when the player has batch_leaves
+BATCH_MIN_CHILDREN = 8
+
+# Milliseconds of time_left iterative_deepening leaves unused, on top of the
+# 100 ms alphabeta keeps for unwinding, to return the move before the timeout
+TIME_RESERVE = 150
+
+
+def _move_budget(time_left, reserve):
+    """Time budget of one deepening search.
+
+    The reserve and the 100 ms alphabeta keeps for unwinding together take at
+    most half of what time_left() reports; below 2 * (reserve + 100) ms both
+    shrink in proportion, so even a short move limit leaves time for depth 1.
+
+    Returns:
+        (float, float): milliseconds of the budget and the margin before its
+        end at which alphabeta starts cutting corners
+    """
+    total = time_left()
+    scale = min(1.0, max(0.0, total) / (2.0 * (reserve + 100)))
+    return total - reserve * scale, 100 * scale
+
+# Half width of the aspiration window pvs_deepening opens around the value of
+# the iteration two plies shallower
+ASPIRATION_WINDOW = 2
+
+
+def iterative_deepening(player, game, time_left, max_depth=None, reserve=TIME_RESERVE):
+    """Run alphabeta to depth 1, 2, 3, ... until the move's time budget runs out.
+
+    The budget is whatever time_left() reports at the start minus reserve
+    (scaled down for short move limits, see _move_budget). An
+    iteration that runs into the end of the budget is thrown away, so the move
+    returned always comes from the deepest iteration that finished. No new
+    iteration is started once less than half of the budget is left, since it
+    would almost certainly not finish.
+
+    Args:
+        player (CustomPlayer): The player searching, see alphabeta
+        game (Board): A board and game state.
+        time_left (function): Used to determine time left before timeout
+        max_depth (int): Deepest iteration to run, None to stop only on time
+            or once the search covers every open space
+        reserve (int): Milliseconds of time_left to leave unused
+
+    Returns:
+        (tuple, int, int): best_move, val, depth the result comes from. If not
+        even depth 1 finished, the first legal move with val None and depth 0.
+    """
+    budget, margin = _move_budget(time_left, reserve)
+    budget_left = Deadline(budget, margin)
+
+    moves = game.get_player_moves(player)
+    best_move, val, depth_reached = (moves[0] if moves else (-1, -1)), None, 0
+
+    # the game cannot last longer than the number of open spaces
+    open_spaces = game.get_open_spaces()
+    if max_depth is None or max_depth > open_spaces:
+        max_depth = open_spaces
+
+    depth = 1
+    while depth <= max_depth:
+        move, value = alphabeta(player, game, budget_left, depth)
+        # alphabeta starts cutting corners when less than 100 ms are left
+        if budget_left.expired():
+            break
+        best_move, val, depth_reached = move, value, depth
+        if getattr(player, "search_stats", None) is not None:
+            player.search_stats.iteration(depth)
+        if getattr(player, "move_orderer", None) is not None:
+            player.move_orderer.set_previous_best(game, best_move)
+        if budget_left() < budget / 2:
+            break
+        depth += 1
+
+    return best_move, val, depth_reached
+
+
+def pvs_deepening(player, game, time_left, max_depth=None, reserve=TIME_RESERVE, window=ASPIRATION_WINDOW):
+    """Iterative deepening over pvs with aspiration windows.
+
+    Like iterative_deepening, but from depth 3 on every iteration starts with
+    a window of +-window around the value of the iteration two plies
+    shallower (the open move score swings between odd and even depths, so
+    the previous iteration is a worse guess). A result at or beyond a side of
+    the window is only a bound, so the iteration is searched again with that
+    side opened up to infinity; the transposition table (if any) makes the
+    re-search cheap.
+
+    Args:
+        player (CustomPlayer): The player searching, see alphabeta
+        game (Board): A board and game state.
+        time_left (function): Used to determine time left before timeout
+        max_depth (int): Deepest iteration to run, None to stop only on time
+            or once the search covers every open space
+        reserve (int): Milliseconds of time_left to leave unused
+        window (float): Half width of the aspiration window, None to always
+            search with the full window
+
+    Returns:
+        (tuple, float, int, list): best_move, val, depth the result comes from
+        and its principal variation. If not even depth 1 finished, the first
+        legal move with val None, depth 0 and an empty principal variation.
+    """
+    budget, margin = _move_budget(time_left, reserve)
+    budget_left = Deadline(budget, margin)
+
+    moves = game.get_player_moves(player)
+    best_move, val, depth_reached, variation = (moves[0] if moves else (-1, -1)), None, 0, []
+
+    open_spaces = game.get_open_spaces()
+    if max_depth is None or max_depth > open_spaces:
+        max_depth = open_spaces
+
+    # values of the finished iterations by depth
+    values = {}
+    depth = 1
+    while depth <= max_depth:
+        guess = values.get(depth - 2)
+        if guess is None or window is None or math.isinf(guess):
+            alpha, beta = float("-inf"), float("inf")
+        else:
+            alpha, beta = guess - window, guess + window
+        while True:
+            move, value, pv = pvs(player, game, budget_left, depth, alpha, beta)
+            if budget_left.expired() or alpha < value < beta:
+                break
+            if value <= alpha:
+                alpha = float("-inf")
+            else:
+                beta = float("inf")
+        if budget_left.expired():
+            break
+        best_move, val, depth_reached, variation = move, value, depth, pv
+        values[depth] = val
+        if getattr(player, "search_stats", None) is not None:
+            player.search_stats.iteration(depth)
+        if getattr(player, "move_orderer", None) is not None:
+            player.move_orderer.set_previous_best(game, best_move)
+        if budget_left() < budget / 2:
+            break
+        depth += 1
+
+    return best_move, val, depth_reached, variation
+
+
+class ParallelSearch:
+    """Root-parallel search on a pool of worker processes.
+
+    The root moves are dealt round-robin to the workers (after sorting them by
+    how much they restrict the opponent, so every worker gets a mix of good and
+    bad candidates). Each worker deepens over its share until a shared wall
+    clock deadline and reports every depth it finished; the merge takes the
+    best move at the deepest depth all workers finished.
+
+    The pool is started once, on the first search or through start(), and then
+    reused for every move; each worker keeps its own transposition table
+    across moves. The position travels packed (Board.to_bytes) next to the
+    pickled player, and each worker rebuilds the board around that player.
+    """
+
+    def __init__(self, workers=None, worker_table_bytes=32 * 1024 * 1024, reserve=TIME_RESERVE):
+        """
+        Args:
+            workers (int): Worker processes, defaults to the number of CPUs
+            worker_table_bytes (int): Memory budget of each worker's
+                transposition table, 0 for none
+            reserve (int): Milliseconds of time_left to leave unused
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.worker_table_bytes = worker_table_bytes
+        self.reserve = reserve
+        self.__pool__ = None
+
+    def start(self):
+        """Start the worker processes now instead of on the first search."""
+        if self.__pool__ is None:
+            self.__pool__ = ProcessPoolExecutor(max_workers=self.workers)
+            for future in [self.__pool__.submit(os.getpid) for i in range(self.workers)]:
+                future.result()
+
+    def close(self):
+        """Shut the worker processes down."""
+        if self.__pool__ is not None:
+            self.__pool__.shutdown(cancel_futures=True)
+            self.__pool__ = None
+
+    def search(self, player, game, time_left):
+        """Find the best move for player.
+
+        Args:
+            player (CustomPlayer): The player searching
+            game (Board): A board and game state.
+            time_left (function): Used to determine time left before timeout
+
+        Returns:
+            (tuple, int, int): best_move, val, depth the result comes from,
+            like iterative_deepening
+        """
+        moves = game.get_player_moves(player)
+        if len(moves) < 2:
+            return (moves[0] if moves else (-1, -1)), None, 0
+        self.start()
+
+        budget, margin = _move_budget(time_left, self.reserve)
+        deadline = time.time() + budget / 1000.0
+        ranked = []
+        for move in moves:
+            game.push_move(move)
+            ranked.append((game.get_active_mobility(), move))
+            game.pop_move()
+        ranked = [move for mobility, move in sorted(ranked)]
+        shares = [ranked[i::self.workers] for i in range(min(self.workers, len(ranked)))]
+
+        data = game.to_bytes()
+        side = 1 if game.__player_1__ is player else 2
+        futures = [self.__pool__.submit(_search_root_share, player, data, side, game.engine, share, deadline,
+                                        margin, self.worker_table_bytes)
+                   for share in shares]
+        results = [future.result() for future in futures]
+
+        depth = min(max(result) if result else 0 for result in results)
+        if depth == 0:
+            return ranked[0], None, 0
+        best_move, val = max((result[depth] for result in results), key=lambda scored: scored[1])
+        return best_move, val, depth
+
+
+# Transposition table of a ParallelSearch worker process, kept across moves
+_WORKER_TABLE = None
+
+
+class _Opponent:
+    """Stand-in for the opponent on a board rebuilt in a worker process."""
+
+
+def _search_root_share(player, data, side, engine, moves, deadline, margin, table_bytes):
+    """Deepen over some of the root moves in a ParallelSearch worker.
+
+    Args:
+        player (CustomPlayer): The player searching
+        data (bytes): The position, packed by Board.to_bytes
+        side (int): Queen of the player, 1 or 2
+        engine (str): Board engine
+        moves (list): The root moves of this worker
+        deadline (float): time.time() to stop at
+        margin (float): Milliseconds before deadline the search starts cutting
+            corners, see _move_budget
+        table_bytes (int): Memory budget of the worker's transposition table
+
+    Returns:
+        dict: {depth: (best_move, val)} for every depth that finished before deadline
+    """
+    global _WORKER_TABLE
+    players = (player, _Opponent()) if side == 1 else (_Opponent(), player)
+    game = Board.from_bytes(data, players[0], players[1], engine)
+    if getattr(player, "symmetry", False):
+        game.track_symmetries()
+    if table_bytes and _WORKER_TABLE is None:
+        _WORKER_TABLE = TranspositionTable(table_bytes)
+    player.transposition_table = _WORKER_TABLE if table_bytes else None
+    if player.transposition_table is not None:
+        player.transposition_table.new_search()
+
+    time_left = Deadline(1000 * (deadline - time.time()), margin)
+
+    results = {}
+    open_spaces = game.get_open_spaces()
+    for depth in range(1, open_spaces + 1):
+        best_move, val = (-1, -1), float("-inf")
+        for move in moves:
+            is_over, winner = game.push_move(move)
+            if is_over:
+                game.pop_move()
+                # same scoring alphabeta uses for a move that ends the game
+                score = player.utility(game, False)
+            else:
+                score = alphabeta(player, game, time_left, depth - 1, val, float("inf"), False)[1]
+                game.pop_move()
+            if score > val:
+                best_move, val = move, score
+        if time_left.expired():
+            break
+        results[depth] = (best_move, val)
+        if best_move in moves:
+            # search this depth's best move first at the next one
+            moves = [best_move] + [move for move in moves if move != best_move]
+    return results
+
+
+class Ponderer:
+    """Searches on a background thread while the opponent thinks.
+
+    After the player returns a move, start() predicts the opponent's likeliest
+    replies and deepens on our answer to each of them, round-robin, until
+    cancelled. The searches run with the player's own transposition table and
+    move orderer, so whatever the opponent plays the next search starts from a
+    warm table; if the opponent played one of the predicted replies and its
+    answer was searched deep enough, take() hands it out without searching.
+
+    The worker checks for cancellation at every node (through the time_left it
+    gives alphabeta), so cancel() returns within a node or two. Python threads
+    share one interpreter lock, so pondering only pays off when the opponent
+    runs in another process; in Board.play_isolation both players share this
+    process and its CPU clock, so the pondering time counts against the
+    opponent. Nothing ponders past the game: the player calls cancel() from
+    its end_game hook, which Board.play_isolation calls when the game ends.
+    """
+
+    def __init__(self, replies=3, min_depth=None, max_seconds=60):
+        """
+        Args:
+            replies (int): Opponent replies searched, the ones the player's
+                evaluation likes least first; None for all of them
+            min_depth (int): Depth a pondered answer needs to be played without
+                searching, defaults to the player's search_depth
+            max_seconds (float): Pondering stops on its own after this long, in
+                case nobody cancels it (e.g. after the game ended)
+        """
+        self.replies = replies
+        self.min_depth = min_depth
+        self.max_seconds = max_seconds
+        self.hits = 0
+        self.misses = 0
+        self.__thread__ = None
+        self.__cancel__ = threading.Event()
+        self.__results__ = {}
+
+    def __getstate__(self):
+        """The worker thread and its results stay behind when pickled."""
+        state = self.__dict__.copy()
+        state["__thread__"] = None
+        state["__cancel__"] = None
+        state["__results__"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__cancel__ = threading.Event()
+
+    def is_running(self):
+        return self.__thread__ is not None and self.__thread__.is_alive()
+
+    def start(self, player, game, move):
+        """Start pondering on the position after player plays move in game.
+
+        Args:
+            player (CustomPlayer): The player who just moved
+            game (Board): The board the move was chosen on (not changed)
+            move (tuple): The move player returned
+        """
+        self.cancel()
+        board = game.copy()
+        is_over, winner = board.push_move(move)
+        if is_over:
+            return
+        if getattr(player, "symmetry", False):
+            board.track_symmetries()
+        player = self.__background_player__(player, board)
+        self.__results__ = {}
+        self.__cancel__ = threading.Event()
+        self.__thread__ = threading.Thread(target=self.__ponder__, args=(player, board, self.__cancel__),
+                                           name="ponder", daemon=True)
+        self.__thread__.start()
+
+    @staticmethod
+    def __background_player__(player, board):
+        """Shallow clone of player without search_stats, put in player's place
+        on board (the worker's own copy), so the worker shares the table and
+        move orderer but never touches the stats the game reads."""
+        clone = object.__new__(type(player))
+        clone.__dict__.update(player.__dict__)
+        clone.search_stats = None
+        for name in ("__player_1__", "__player_2__", "__active_player__", "__inactive_player__"):
+            if getattr(board, name) is player:
+                setattr(board, name, clone)
+        return clone
+
+    def cancel(self):
+        """Stop pondering and wait for the worker thread to finish."""
+        self.__cancel__.set()
+        if self.__thread__ is not None:
+            self.__thread__.join()
+            self.__thread__ = None
+
+    def take(self, player, game):
+        """Cancel pondering and look up the answer for the position in game.
+
+        Args:
+            player (CustomPlayer): The player to move
+            game (Board): The position after the opponent's real reply
+
+        Returns:
+            (tuple, float, int): best move, val and depth pondered for this
+            position, or None on a miss (unpredicted reply or too shallow) and
+            when there was nothing pondered
+        """
+        if self.__thread__ is None:
+            return None
+        self.cancel()
+        found = self.__results__.get(game.get_zobrist_hash())
+        self.__results__ = {}
+        min_depth = self.min_depth if self.min_depth is not None else player.search_depth
+        if found is None or found[2] < min_depth or found[0] not in game.get_player_moves(player):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return found
+
+    def __ponder__(self, player, board, cancelled):
+        deadline = time.perf_counter() + self.max_seconds
+
+        def time_left():
+            if cancelled.is_set() or time.perf_counter() > deadline:
+                return 0
+            return float("inf")
+
+        # the opponent's replies that leave us worst off are the likeliest
+        scored = []
+        for reply in board.get_active_moves():
+            is_over, winner = board.push_move(reply)
+            if not is_over:
+                scored.append((player.utility(board, True), reply))
+            board.pop_move()
+        replies = [reply for score, reply in sorted(scored)][:self.replies]
+
+        open_spaces = board.get_open_spaces()
+        for depth in range(1, open_spaces):
+            for reply in replies:
+                board.push_move(reply)
+                move, val = alphabeta(player, board, time_left, depth)
+                if time_left() < 100:
+                    return
+                self.__results__[board.get_zobrist_hash()] = (move, val, depth)
+                if getattr(player, "move_orderer", None) is not None:
+                    player.move_orderer.set_previous_best(board, move)
+                board.pop_move()
+
 ######################################################################
 ########## DON'T WRITE ANY CODE OUTSIDE THE FUNCTION! ################
 ######## IF YOU WANT TO CALL OR TEST IT CREATE A NEW CELL ############
@@ -0,0 +1,25 @@
+import pytest
+
+from benchmark import POSITIONS, load_position, perft
+from isolation import Board
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+@pytest.mark.parametrize("name,depth,leaves", [(name, depth, leaves) for name, position in POSITIONS.items()
+                                               for depth, leaves in position["perft"].items()])
+def test_perft_matches_reference_counts(engine, name, depth, leaves):
+    board, player_1, player_2 = load_position(name, engine)
+    state = board.get_state()
+    assert perft(board, depth) == leaves
+    assert board.get_state() == state
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_mobility_counts_match_move_lists(engine, name):
+    board, player_1, player_2 = load_position(name, engine)
+    for move in board.get_active_moves():
+        board.push_move(move)
+        assert board.get_active_mobility() == len(board.get_active_moves())
+        assert board.get_inactive_mobility() == len(board.get_inactive_moves())
+        board.pop_move()
@@ -0,0 +1,87 @@
+import os
+import random
+import time
+
+import pytest
+
+from game_record import GameRecord, GameRecordWriter, decode_record, encode_record, read_records, replay
+from isolation import Board
+
+
+class RandomPlayer:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def move(self, game, time_left):
+        return self.rng.choice(game.get_active_moves())
+
+
+class SlowPlayer(RandomPlayer):
+    """Plays random moves, but burns CPU past the limit on its third move."""
+
+    def __init__(self, seed=0):
+        RandomPlayer.__init__(self, seed)
+        self.moves = 0
+
+    def move(self, game, time_left):
+        self.moves += 1
+        if self.moves == 3:
+            # past the limit on both clocks play_isolation may judge by: wall time and user CPU time
+            wall, cpu = time.time(), os.times().user
+            while time.time() - wall < 0.3 or os.times().user - cpu < 0.3:
+                pass
+        return RandomPlayer.move(self, game, time_left)
+
+
+class NonePlayer(RandomPlayer):
+    def move(self, game, time_left):
+        return None
+
+
+def play(player_1, player_2, width=7, height=7, time_limit=10000):
+    board = Board(player_1, player_2, width, height)
+    winner, move_history, termination = board.play_isolation(time_limit=time_limit)
+    return GameRecord.from_game(board, winner, move_history, termination), board
+
+
+@pytest.mark.parametrize("size", [(7, 7), (16, 16)])
+def test_encode_decode_round_trip(size):
+    record, board = play(RandomPlayer(1), RandomPlayer(2), *size)
+    assert decode_record(encode_record(record)) == record
+    assert record.termination_text().endswith(" has no legal moves left.")
+
+
+def test_writer_and_reader(tmp_path):
+    path = str(tmp_path / "games.bin")
+    records = [play(RandomPlayer(seed), RandomPlayer(seed + 1))[0] for seed in range(5)]
+    with GameRecordWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    # a record cut short at the end is skipped
+    with open(path, "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x07")
+    assert list(read_records(path)) == records
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_replay_reaches_the_final_position(engine):
+    record, board = play(RandomPlayer(3), RandomPlayer(4))
+    positions = [position.get_state() for position in replay(decode_record(encode_record(record)), engine)]
+    assert len(positions) == len(record.moves) + 1
+    assert positions[-1] == board.get_state()
+
+
+def test_replay_stops_before_a_timed_out_move():
+    record, board = play(SlowPlayer(5), RandomPlayer(6), time_limit=100)
+    assert record.termination_text().endswith(" timed out.")
+    positions = [position.get_state() for position in replay(record)]
+    assert len(positions) == len(record.moves)
+    assert positions[-1] == board.get_state()
+
+
+def test_none_move_ends_the_record():
+    record, board = play(RandomPlayer(7), NonePlayer())
+    assert record.moves[-1] == Board.NOT_MOVED
+    assert record.termination_text().endswith(" made an illegal move.")
+    assert decode_record(encode_record(record)) == record
+    assert len(list(replay(record))) == len(record.moves)
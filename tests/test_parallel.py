@@ -0,0 +1,30 @@
+import pickle
+
+import pytest
+
+from benchmark import load_position
+from isolation import Board, Deadline
+from submission import ParallelSearch, alphabeta
+
+
+@pytest.fixture(scope="module")
+def parallel():
+    search = ParallelSearch(workers=2, worker_table_bytes=0)
+    yield search
+    search.close()
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_parallel_search_agrees_with_alphabeta(parallel, engine):
+    board, player_1, player_2 = load_position("midgame", engine)
+    best_move, val, depth = parallel.search(player_1, board, Deadline(1000))
+    assert depth > 0
+    assert best_move in board.get_active_moves()
+    assert val == alphabeta(player_1, board, lambda: float("inf"), depth)[1]
+
+
+def test_parallel_search_is_not_pickled_with_the_player(parallel):
+    board, player_1, player_2 = load_position("midgame")
+    player_1.parallel = parallel
+    parallel.start()
+    assert pickle.loads(pickle.dumps(player_1)).parallel is None
@@ -0,0 +1,48 @@
+from functools import partial
+
+import pytest
+
+from selfplay import COMPLETED, ShardWriter, play_selfplay_game, read_dataset, run_selfplay
+from submission import CustomPlayer
+
+WIDTH = HEIGHT = 5
+FACTORY = partial(CustomPlayer, search_depth=1)
+
+
+def selfplay(directory, games):
+    return list(run_selfplay(str(directory), FACTORY, games=games, workers=2, width=WIDTH, height=HEIGHT))
+
+
+def test_samples_are_deduplicated(tmp_path):
+    samples = play_selfplay_game(FACTORY, 0, width=WIDTH, height=HEIGHT)
+    with ShardWriter(str(tmp_path), WIDTH, HEIGHT, shard_size=3) as writer:
+        assert writer.write_game(0, samples) == len(set(key for key, data in samples))
+        assert writer.write_game(1, samples) == 0
+    stored = list(read_dataset(str(tmp_path)))
+    assert len(stored) == len(set(sample["key"] for sample in stored))
+
+
+def test_resume_plays_every_missing_game(tmp_path):
+    first = selfplay(tmp_path, 4)
+    assert sorted(result["game"] for result in first) == [0, 1, 2, 3]
+    # as if a run was interrupted with game 5 finished and game 4 still in flight
+    samples = play_selfplay_game(FACTORY, 5, width=WIDTH, height=HEIGHT)
+    with ShardWriter(str(tmp_path), WIDTH, HEIGHT) as writer:
+        writer.write_game(5, samples)
+    rest = selfplay(tmp_path, 8)
+    assert sorted(result["game"] for result in rest) == [4, 6, 7]
+    assert selfplay(tmp_path, 8) == []
+
+
+def test_completion_log_survives_a_torn_write(tmp_path):
+    selfplay(tmp_path, 2)
+    with open(str(tmp_path / "games.bin"), "ab") as f:
+        f.write(COMPLETED.pack(7)[:2])
+    with ShardWriter(str(tmp_path), WIDTH, HEIGHT) as writer:
+        assert writer.completed == {0, 1}
+
+
+def test_board_size_must_match(tmp_path):
+    selfplay(tmp_path, 1)
+    with pytest.raises(ValueError):
+        ShardWriter(str(tmp_path), WIDTH + 1, HEIGHT)
@@ -0,0 +1,86 @@
+import pickle
+import random
+
+import pytest
+
+from board_batch import BoardBatch
+from isolation import Board
+
+
+class Player:
+    pass
+
+
+class Other:
+    pass
+
+
+def random_board(seed, engine, width=7, height=7):
+    rng = random.Random(seed)
+    board = Board(Player(), Other(), width, height, engine=engine)
+    for i in range(rng.randrange(0, 12)):
+        moves = board.get_active_moves()
+        if not moves:
+            break
+        is_over, winner = board.__apply_move__(rng.choice(moves))
+        if is_over:
+            break
+    return board
+
+
+def same_position(a, b):
+    assert a.get_state() == b.get_state()
+    assert a.get_active_position() == b.get_active_position()
+    assert a.get_active_moves() == b.get_active_moves()
+    assert a.get_inactive_moves() == b.get_inactive_moves()
+    assert a.get_active_mobility() == b.get_active_mobility()
+    assert a.get_zobrist_hash() == b.get_zobrist_hash()
+    assert a.move_count == b.move_count
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+@pytest.mark.parametrize("seed", range(10))
+def test_bytes_round_trip(engine, seed):
+    board = random_board(seed, engine)
+    data = board.to_bytes()
+    assert len(data) == Board.packed_size(board.width, board.height)
+    copy = Board.from_bytes(data, board.__player_1__, board.__player_2__, engine)
+    same_position(board, copy)
+    assert copy.to_bytes() == data
+
+
+@pytest.mark.parametrize("engine", Board.ENGINES)
+def test_pickle_leaves_the_lookup_tables_behind(engine):
+    board = random_board(3, engine)
+    data = pickle.dumps(board)
+    assert len(data) < 4096
+    copy = pickle.loads(data)
+    same_position(board, copy)
+    for name in board.__tables__:
+        assert getattr(copy, name) == getattr(board, name)
+    assert copy.__rays__ is board.__rays__
+
+
+def test_board_batch():
+    boards = [random_board(seed, "bitboard") for seed in range(6)]
+    with BoardBatch.from_boards(boards) as batch:
+        assert len(batch) == len(boards)
+        attached = pickle.loads(pickle.dumps(batch))
+        for i, board in enumerate(boards):
+            same_position(board, attached.get(i, Player(), Other()))
+        batch[0] = boards[5]
+        same_position(boards[5], attached.get(0, Player(), Other()))
+        with pytest.raises(IndexError):
+            batch.append(boards[0])
+        with pytest.raises(IndexError):
+            attached.get(len(boards), Player(), Other())
+        attached.close()
+
+
+def test_board_batch_checks_sizes():
+    with pytest.raises(ValueError):
+        BoardBatch.from_boards([])
+    with BoardBatch(2, 7, 7) as batch:
+        with pytest.raises(ValueError):
+            batch.append(random_board(0, "bitboard", 5, 5))
+        assert len(batch) == 0
@@ -0,0 +1,39 @@
+import math
+import random
+from functools import partial
+
+import pytest
+
+from tournament import elo_to_score, play_game, random_opening, score_to_elo, sprt_bounds, sprt_llr
+from submission import CustomPlayer
+
+
+def test_sprt_bounds():
+    lower, upper = sprt_bounds(0.05, 0.05)
+    assert upper == pytest.approx(math.log(19))
+    assert lower == pytest.approx(-math.log(19))
+
+
+def test_sprt_llr():
+    assert sprt_llr(0, 0, 0.0, 10.0) == 0.0
+    p0, p1 = elo_to_score(0.0), elo_to_score(10.0)
+    assert sprt_llr(3, 2, 0.0, 10.0) == pytest.approx(3 * math.log(p1 / p0) + 2 * math.log((1 - p1) / (1 - p0)))
+    assert sprt_llr(10, 0, 0.0, 10.0) > 0 > sprt_llr(0, 10, 0.0, 10.0)
+
+
+def test_elo_score_round_trip():
+    assert elo_to_score(0.0) == 0.5
+    for elo in (-300.0, -10.0, 0.0, 50.0, 400.0):
+        assert score_to_elo(elo_to_score(elo)) == pytest.approx(elo)
+    assert score_to_elo(0.0) == -1000.0
+    assert score_to_elo(1.0) == 1000.0
+
+
+@pytest.mark.parametrize("plies", [1, 2, 3])
+@pytest.mark.parametrize("a_is_p1", [True, False])
+def test_play_game_after_opening(plies, a_is_p1):
+    factory = partial(CustomPlayer, search_depth=1)
+    opening = random_opening(random.Random(plies), plies, 7, 7)
+    result = play_game(factory, factory, a_is_p1, opening, 7, 7, record=True)
+    assert result["termination"].endswith(" has no legal moves left.")
+    assert result["moves"] > plies
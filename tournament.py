@@ -0,0 +1,245 @@
+"""
+Run many games of isolation between two players on a process pool, stopping as soon as a sequential
+probability ratio test (SPRT) settles whether player A is stronger or weaker than player B.
+
+Example, testing a depth 4 player against depth 3 for a gain of at least 20 Elo:
+
+    python tournament.py submission:CustomPlayer submission:CustomPlayer \
+        --a-kwargs '{"search_depth": 4}' --b-kwargs '{"search_depth": 3}' --elo0 0 --elo1 20
+
+Every finished game is printed as one JSON line, followed by a summary line.
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+import importlib
+import json
+import math
+import os
+import random
+import sys
+
+from isolation import Board
+from game_record import GameRecord, GameRecordWriter, encode_record
+
+
+class _OpeningPlayer:
+    """Stand-in player used while generating random openings."""
+
+
+def random_opening(rng, plies, width=9, height=9):
+    """
+    Pick a random sequence of legal opening moves that does not end the game.
+    Parameters:
+        rng: random.Random, Source of randomness
+        plies: int, Number of moves (both players together) in the opening
+        width: int, Board width
+        height: int, Board height
+    Returns:
+        [(int, int)]: Opening moves in the order they are played
+    """
+    while True:
+        board = Board(_OpeningPlayer(), _OpeningPlayer(), width, height, engine="bitboard")
+        moves = []
+        for i in range(plies):
+            move = rng.choice(board.get_active_moves())
+            moves.append(move)
+            is_over, winner = board.push_move(move)
+            if is_over:
+                break
+        else:
+            return moves
+
+
+def play_game(factory_a, factory_b, a_is_p1, opening, width=9, height=9, time_limit=10000, engine="bitboard",
+              record=False):
+    """
+    Play one game between fresh players from the two factories. Meant to run in a worker process.
+    Parameters:
+        factory_a: callable, Returns a new player A
+        factory_b: callable, Returns a new player B
+        a_is_p1: bool, Whether player A plays queen 1 (moves first)
+        opening: [(int, int)], Moves applied before the players take over
+        width: int, Board width
+        height: int, Board height
+        time_limit: int, Time limit per move in milliseconds
+        engine: str, Board engine
+        record: bool, Add the game as an encoded GameRecord (bytes) under "record"
+    Returns:
+        dict: a_is_p1, opening, a_won, number of moves, termination reason
+    """
+    player_a, player_b = factory_a(), factory_b()
+    if a_is_p1:
+        board = Board(player_a, player_b, width, height, engine=engine)
+    else:
+        board = Board(player_b, player_a, width, height, engine=engine)
+    for move in opening:
+        board.__apply_move__(move)
+
+    # play_isolation ends the game for the players (Board.end_game), so no pondering outlives it
+    winner, move_history, termination = board.play_isolation(time_limit=time_limit)
+    result = {"a_is_p1": a_is_p1,
+              "opening": opening,
+              "a_won": (winner == board.__queen_1__) == a_is_p1,
+              "moves": board.move_count,
+              "termination": termination}
+    if record:
+        result["record"] = encode_record(GameRecord.from_game(board, winner, move_history, termination, opening))
+    return result
+
+
+def elo_to_score(elo):
+    """
+    Expected score of a player that is elo points stronger than its opponent.
+    """
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def score_to_elo(score):
+    """
+    Elo difference matching an expected score, clamped to +-1000 at score 1 or 0.
+    """
+    if score <= 0.0:
+        return -1000.0
+    if score >= 1.0:
+        return 1000.0
+    return max(-1000.0, min(1000.0, -400.0 * math.log10(1.0 / score - 1.0)))
+
+
+def sprt_llr(wins, losses, elo0, elo1):
+    """
+    Log likelihood ratio of H1 (A is elo1 stronger) against H0 (A is elo0 stronger) after wins and
+    losses. Isolation has no draws, so each game is a Bernoulli trial.
+    """
+    p0, p1 = elo_to_score(elo0), elo_to_score(elo1)
+    return wins * math.log(p1 / p0) + losses * math.log((1.0 - p1) / (1.0 - p0))
+
+
+def sprt_bounds(alpha, beta):
+    """
+    Lower and upper LLR bounds of an SPRT with false positive rate alpha and false negative rate beta.
+    """
+    return math.log(beta / (1.0 - alpha)), math.log((1.0 - beta) / alpha)
+
+
+def run_match(factory_a, factory_b, games=1000, workers=None, opening_plies=2, elo0=0.0, elo1=10.0,
+              alpha=0.05, beta=0.05, width=9, height=9, time_limit=10000, engine="bitboard", seed=None,
+              record=False):
+    """
+    Play up to games games between A and B on a process pool and stream the results. Games come in
+    pairs that share a random opening, with A playing queen 1 in one and queen 2 in the other. Only a few
+    games per worker are in flight at a time, so a match that the SPRT settles early wastes little work.
+    Parameters:
+        factory_a, factory_b: callable, Return new players; must be picklable (module level
+            functions, classes or functools.partial of them)
+        games: int, Maximum number of games
+        workers: int, Worker processes, defaults to the number of CPUs
+        opening_plies: int, Random moves played before the players take over
+        elo0, elo1: float, Elo difference of A over B under H0 and H1
+        alpha, beta: float, Error rates of the SPRT
+        width, height: int, Board size
+        time_limit: int, Time limit per move in milliseconds
+        engine: str, Board engine
+        seed: int, Seed for the openings
+        record: bool, Include every game as an encoded GameRecord, see play_game
+    Returns:
+        generator of dict: One entry per finished game with the running totals; the entry that
+        settles the test has "sprt" set to "H0" or "H1", every other entry has it None (including the
+        last one when the games run out before the test settles)
+    """
+    workers = workers or os.cpu_count() or 1
+    rng = random.Random(seed)
+    lower, upper = sprt_bounds(alpha, beta)
+    wins = losses = 0
+    next_game = 0
+    opening = None
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        while True:
+            while next_game < games and len(pending) < 2 * workers:
+                if next_game % 2 == 0:
+                    opening = random_opening(rng, opening_plies, width, height)
+                pending.add(pool.submit(play_game, factory_a, factory_b, next_game % 2 == 0, opening,
+                                        width, height, time_limit, engine, record))
+                next_game += 1
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result["a_won"]:
+                    wins += 1
+                else:
+                    losses += 1
+                llr = sprt_llr(wins, losses, elo0, elo1)
+                result.update({"wins": wins,
+                               "losses": losses,
+                               "elo": score_to_elo(wins / float(wins + losses)),
+                               "llr": llr,
+                               "sprt": "H1" if llr >= upper else "H0" if llr <= lower else None})
+                yield result
+                if result["sprt"] is not None:
+                    # drop the queued games and do not wait for the running ones when the with block exits
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    return
+
+
+def load_factory(spec, kwargs=None):
+    """
+    Turn "module:attribute" (e.g. "submission:CustomPlayer") into a picklable player factory.
+    """
+    module_name, attribute = spec.split(":")
+    factory = getattr(importlib.import_module(module_name), attribute)
+    return partial(factory, **kwargs) if kwargs else factory
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Run a match between two isolation players with SPRT early stopping.")
+    parser.add_argument("player_a", help="factory of player A as module:attribute")
+    parser.add_argument("player_b", help="factory of player B as module:attribute")
+    parser.add_argument("--a-kwargs", type=json.loads, default=None, help="JSON keyword arguments for A")
+    parser.add_argument("--b-kwargs", type=json.loads, default=None, help="JSON keyword arguments for B")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--opening-plies", type=int, default=2)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--width", type=int, default=9)
+    parser.add_argument("--height", type=int, default=9)
+    parser.add_argument("--time-limit", type=int, default=10000)
+    parser.add_argument("--engine", choices=Board.ENGINES, default="bitboard")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--record", default=None, help="append every game to this game record file")
+    args = parser.parse_args(argv)
+
+    writer = GameRecordWriter(args.record) if args.record else None
+    result = None
+    for result in run_match(load_factory(args.player_a, args.a_kwargs), load_factory(args.player_b, args.b_kwargs),
+                            games=args.games, workers=args.workers, opening_plies=args.opening_plies,
+                            elo0=args.elo0, elo1=args.elo1, alpha=args.alpha, beta=args.beta,
+                            width=args.width, height=args.height, time_limit=args.time_limit,
+                            engine=args.engine, seed=args.seed, record=writer is not None):
+        if writer is not None:
+            writer.write_encoded(result.pop("record"))
+            writer.flush()
+        print(json.dumps(result))
+        sys.stdout.flush()
+    if writer is not None:
+        writer.close()
+
+    if result is not None:
+        print(json.dumps({"summary": True,
+                          "games": result["wins"] + result["losses"],
+                          "wins": result["wins"],
+                          "losses": result["losses"],
+                          "elo": result["elo"],
+                          "llr": result["llr"],
+                          "sprt": result["sprt"]}))
+
+
+if __name__ == "__main__":
+    main()